@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -133,3 +134,51 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Optimizer settings
+
+# Number of worker processes used to solve the cells of the auto-simulate sweep in parallel.
+# 1 solves the cells one after another in the request thread.
+SWEEP_MAX_WORKERS = int(os.environ.get("SWEEP_MAX_WORKERS", os.cpu_count() or 1))
+
+# "cells" builds a model instance for every cell of the sweep, "persistent" builds one instance
+# per worker and re-solves it with updated installed capacities, "warm" re-solves it in serpentine
+# order with a warm-start backend (highs unless the selected solver can warm-start).
+SWEEP_MODE = os.environ.get("SWEEP_MODE", "cells")
+
+# Skip the sweep cells with both sliders at or below an infeasible cell, they are returned as
+# infeasible without charts. A request can enable it with the "pruneInfeasible" field of the slider data.
+SWEEP_PRUNE_INFEASIBLE = os.environ.get("SWEEP_PRUNE_INFEASIBLE", "").lower() in ("1", "true", "yes")
+
+# Solver backend of graph_to_scenario.solvers: "glpk" (subprocess) or "highs" (in-process HiGHS,
+# needs highspy). A request can select another backend with the "solver" field of the slider data.
+OPTIMIZER_SOLVER = os.environ.get("OPTIMIZER_SOLVER", "glpk")
+
+# Cache of solved scenarios, keyed by graph, slider values, solver backend and timestep scenario.
+# RESULT_CACHE_MAX_ENTRIES = 0 disables the cache, RESULT_CACHE_DIR enables the on-disk tier.
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MAX_ENTRIES = 10000
+
+# Asynchronous solve jobs: number of jobs running at the same time and finished jobs kept for polling.
+JOB_MAX_WORKERS = 4
+JOB_MAX_FINISHED = 100
+
+# Logging of the optimizer: OPTIMIZER_LOG_LEVEL is the level of the home and graph_to_scenario loggers,
+# TRACE_LOG_LEVEL the level at which the stage timings of every request and sweep are logged.
+OPTIMIZER_LOG_LEVEL = os.environ.get("OPTIMIZER_LOG_LEVEL", "INFO")
+TRACE_LOG_LEVEL = os.environ.get("TRACE_LOG_LEVEL", "DEBUG")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "home": {"handlers": ["console"], "level": OPTIMIZER_LOG_LEVEL},
+        "graph_to_scenario": {"handlers": ["console"], "level": OPTIMIZER_LOG_LEVEL},
+    },
+}
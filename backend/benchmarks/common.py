@@ -0,0 +1,76 @@
+"""
+This file contains helpers shared by the benchmarks: loading the bundled scenarios
+and building the request json the frontend would send for them.
+"""
+
+import copy, json
+from pathlib import Path
+
+SCENARIO_FOLDER = Path(__file__).resolve().parent.parent / "scenario"
+GRID_SIZE = 6
+
+
+def list_scenarios():
+    """Returns the ids of the bundled scenarios (scenario/scenario<id>/graph.json)."""
+    ids = [p.parent.name[len("scenario"):] for p in SCENARIO_FOLDER.glob("scenario*/graph.json")]
+    return sorted(ids, key=int)
+
+
+def load_graph_data(scenario_id, slider_value=3, auto_simulate=False):
+    """
+    Returns the request json for a bundled scenario, like it is sent by the frontend.
+    All producers and batteries get the same slider value, the first two producers are selected.
+
+    Args:
+        scenario_id (str): The id of the scenario.
+        slider_value (int): The slider value of all producers and batteries.
+        auto_simulate (bool): Whether the request is an auto-simulate sweep.
+
+    Returns:
+        dict: The request json.
+    """
+    with open(SCENARIO_FOLDER / f"scenario{scenario_id}" / "graph.json", "r") as f:
+        graph = json.load(f)
+
+    prodCapacities = [
+        [node["id"][5:], slider_value]
+        for node in graph["nodes"]
+        if node["type"] in ("producer", "battery")
+    ]
+    producers = [node["id"][5:] for node in graph["nodes"] if node["type"] == "producer"]
+    sliderVals = [{"nodeID": node_id, "value": slider_value} for node_id in producers[:2]]
+
+    return {
+        "nodes": graph["nodes"],
+        "edges": graph["edges"],
+        "sliderData": {
+            "reset": False,
+            "autoSimulate": auto_simulate,
+            "prodCapacities": prodCapacities,
+            "sliderVals": sliderVals,
+        },
+    }
+
+
+def sweep_capacities(graph_data):
+    """Returns the prodCapacities of all cells of the auto-simulate sweep, in matrix order."""
+    slider_data = graph_data["sliderData"]
+    ids = [entry[0] for entry in slider_data["prodCapacities"]]
+    indexCol = ids.index(slider_data["sliderVals"][0]["nodeID"])
+    indexRow = ids.index(slider_data["sliderVals"][1]["nodeID"])
+
+    cells = []
+    for col in range(GRID_SIZE):
+        for row in range(GRID_SIZE):
+            capacities = copy.deepcopy(slider_data["prodCapacities"])
+            capacities[indexCol][1] = col
+            capacities[indexRow][1] = row
+            cells.append(capacities)
+    return cells
+
+
+def with_capacities(graph_data, prodCapacities):
+    """Returns a copy of the request json with other slider values."""
+    data = copy.deepcopy(graph_data)
+    data["sliderData"]["prodCapacities"] = copy.deepcopy(prodCapacities)
+    return data
@@ -0,0 +1,69 @@
+"""
+Benchmark of the abstract model cache.
+Builds (and optionally solves) the instances of an auto-simulate sweep, once declaring the
+abstract model for every cell like before and once reusing the cached abstract model.
+
+Usage (from the backend folder):
+    python -m benchmarks.model_cache --scenario 1 [--solve]
+"""
+
+import argparse, json, statistics, time
+from graph_to_scenario.scenario import Scenario
+from graph_to_scenario import model as opt
+from benchmarks.common import load_graph_data, sweep_capacities, with_capacities
+
+
+def time_cell(graph_data, cached, solve):
+    """Returns the wall times of one cell as a dict."""
+    times = {}
+    scenario = Scenario(graph_data, solve=False)
+
+    start = time.perf_counter()
+    if cached:
+        optimizer = opt.get_cached_abstract_pyomo_model(fix_capacities=True)
+    else:
+        optimizer = opt.get_abstract_pyomo_model(fix_capacities=True)
+    times["declare_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    instance = scenario.build_instance(optimizer)
+    times["instance_s"] = time.perf_counter() - start
+
+    if solve:
+        start = time.perf_counter()
+        opt.solve_instance(instance)
+        times["solve_s"] = time.perf_counter() - start
+
+    times["total_s"] = sum(times.values())
+    return times
+
+
+def run(scenario_id, solve=False):
+    """Runs the sweep with and without the cache and returns the summary."""
+    graph_data = load_graph_data(scenario_id, auto_simulate=True)
+    cells = sweep_capacities(graph_data)
+    opt.get_cached_abstract_pyomo_model(fix_capacities=True)  # warm up, built once per process
+
+    summary = {"scenario": scenario_id, "cells": len(cells), "solve": solve}
+    for label, cached in (("uncached", False), ("cached", True)):
+        times = [time_cell(with_capacities(graph_data, c), cached, solve) for c in cells]
+        summary[label] = {
+            key: statistics.mean(t[key] for t in times) for key in times[0]
+        }
+
+    saved = summary["uncached"]["total_s"] - summary["cached"]["total_s"]
+    summary["saved_per_solve_s"] = saved
+    summary["saved_per_sweep_s"] = saved * len(cells)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", default="1", help="id of the bundled scenario")
+    parser.add_argument("--solve", action="store_true", help="also solve every cell")
+    args = parser.parse_args()
+    print(json.dumps(run(args.scenario, args.solve), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+End-to-end benchmark of the optimizer.
+Runs the bundled scenarios (scenario/scenario<id>/graph.json) with every timestep file and
+every available solver backend, in single-cell and auto-simulate mode, and reports the wall time
+and the peak memory of every stage as JSON, so that runs before and after a change can be compared.
+The "solvers" section of the report compares the solve times of the backends, and the
+"warm_start" section compares every auto-simulate sweep solved cold ("cells" mode, a new instance
+and solver per cell) with the warm-started sweep (serpentine order, every re-solve starts from the
+basis of the adjacent cell), both with the warm-start backend: simplex iterations, sweep wall time
+and time spent in the solver, and how much of them the warm start saves. The sweep in "persistent"
+mode (re-solves column by column) is reported too, with what the serpentine order alone saves.
+HiGHS reports no simplex iterations for an LP its presolve solves, so a cold sweep can report
+fewer iterations than the warm one, the solver time is the measure to compare.
+
+Single-cell stages: prepare (Scenario without solving), build (model instance), solve (with the
+termination condition, iterations and model size of the solve), results (extraction of the solved
+values), process_response (the whole request) and encode.
+Auto-simulate stages: sweep (process_response of the 36 cells, with the number of cells skipped
+by --prune) and encode.
+
+The result cache is disabled, so that every run and every repeat solves its cells (sweep workers
+never cache, they return their results to this process).
+
+The peak memory is measured with tracemalloc in a second run of every case, so that the
+tracing does not slow down the timed run. It only covers the benchmark process, cells solved
+by pool workers (--workers > 1) are not included.
+
+Usage (from the backend folder):
+    python -m benchmarks.suite [--scenario 1 ...] [--timesteps 1day.txt ...] [--mode single auto]
+                               [--solver glpk highs] [--repeat 3] [--workers 1] [--prune] [--no-memory]
+                               [--output results.json]
+"""
+
+import argparse, copy, json, platform, statistics, sys, time, tracemalloc
+from contextlib import contextmanager
+from graph_to_scenario.scenario import Scenario, ScenarioResults
+from graph_to_scenario import model as opt
+from graph_to_scenario import solvers, tracing
+from home.response_processing_new import OptimizerResultProcessor
+from home.sweep_engine import SweepEngine
+from home import result_cache, result_serializer
+from benchmarks.common import list_scenarios, load_graph_data
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+TIMESTEP_FILES = ("1day.txt", "2hours.txt", "4ThinWeeks.txt")
+MODES = ("single", "auto")
+# Stages making up the request as the view handles it, their sum is reported as request_s
+REQUEST_STAGES = {"single": ("process_response", "encode"), "auto": ("sweep", "encode")}
+
+
+@contextmanager
+def stage(stages, name):
+    """Records the wall time, and the peak memory if tracemalloc is tracing, of the block as stages[name]."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = stages.setdefault(name, {})
+        entry["wall_s"] = time.perf_counter() - start
+        if tracing:
+            entry["peak_mb"] = (tracemalloc.get_traced_memory()[1] - start_memory) / 2**20
+
+
+def run_single(graph_data, workers):
+    """Runs one cell stage by stage and returns the stages."""
+    result_cache.disable_result_cache()
+    stages = {}
+    solver_name = graph_data["sliderData"].get("solver")
+    with stage(stages, "prepare"):
+        scenario = Scenario(copy.deepcopy(graph_data), solve=False, solver_name=solver_name)
+    with stage(stages, "build"):
+        instance = scenario.build_instance()
+    with stage(stages, "solve"):
+        stats = opt.solve_instance(instance, opt.get_solver(solver_name))
+    stages["solve"].update(
+        termination_condition=stats.termination_condition,
+        iterations=stats.iterations,
+        rows=stats.rows,
+        cols=stats.cols,
+        nonzeros=stats.nonzeros,
+    )
+    with stage(stages, "results"):
+        ScenarioResults(instance, stats).detach()
+
+    with stage(stages, "process_response"):
+        result = OptimizerResultProcessor(copy.deepcopy(graph_data), max_workers=workers).process_response()
+    with stage(stages, "encode"):
+        encoded = result_serializer.dumps(result)
+    stages["encode"]["bytes"] = len(encoded)
+    return stages
+
+
+def run_auto(graph_data, workers):
+    """Runs an auto-simulate sweep and returns the stages."""
+    result_cache.disable_result_cache()
+    stages = {}
+    with stage(stages, "sweep"):
+        result = OptimizerResultProcessor(copy.deepcopy(graph_data), max_workers=workers).process_response()
+    if "prunedCells" in result:
+        stages["sweep"]["pruned"] = result["prunedCells"]
+    with stage(stages, "encode"):
+        encoded = result_serializer.dumps(result)
+    stages["encode"]["bytes"] = len(encoded)
+    return stages
+
+
+def run_case(scenario_id, timestep_file, mode, solver=solvers.DEFAULT_SOLVER, repeat=1, workers=1, memory=True,
+             prune=False):
+    """
+    Benchmarks one scenario, timestep file, mode and solver backend.
+
+    Args:
+        scenario_id (str): The id of the bundled scenario.
+        timestep_file (str): The name of the timestep file in the volume data folder.
+        mode (str): "single" or "auto".
+        solver (str): The solver backend.
+        repeat (int): Number of timed runs, the median of every stage is reported.
+        workers (int): Sweep worker processes, 1 solves the cells in this process.
+        memory (bool): Whether to measure the peak memory in an extra run.
+        prune (bool): Whether the sweep skips the cells proven infeasible.
+
+    Returns:
+        dict: The case and the wall time (and peak memory) of every stage.
+    """
+    graph_data = load_graph_data(scenario_id, auto_simulate=mode == "auto")
+    graph_data["sliderData"]["timestepFile"] = timestep_file
+    graph_data["sliderData"]["solver"] = solver
+    graph_data["sliderData"]["pruneInfeasible"] = prune
+    run_mode = run_auto if mode == "auto" else run_single
+
+    runs = [run_mode(graph_data, workers) for _ in range(repeat)]
+    stages = {
+        name: {"wall_s": statistics.median(r[name]["wall_s"] for r in runs)}
+        for name in runs[0]
+    }
+    for name, entry in runs[0].items():  # sizes and solver statistics are the same in every run
+        stages[name].update((key, value) for key, value in entry.items() if key != "wall_s")
+
+    if memory:
+        tracemalloc.start()
+        try:
+            for name, entry in run_mode(graph_data, workers).items():
+                stages[name]["peak_mb"] = entry["peak_mb"]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "scenario": scenario_id,
+        "timestep_file": timestep_file,
+        "timesteps": len(Scenario(copy.deepcopy(graph_data), solve=False).timesteps),
+        "mode": mode,
+        "solver": solver,
+        "stages": stages,
+        "request_s": sum(stages[name]["wall_s"] for name in REQUEST_STAGES[mode]),
+    }
+
+
+def run_sweep(graph_data, mode, workers):
+    """Runs an auto-simulate sweep in the given sweep mode and returns its wall time, solver time and iterations."""
+    result_cache.disable_result_cache()
+    processor = OptimizerResultProcessor(copy.deepcopy(graph_data), max_workers=workers)
+    processor.read_slider_data()
+    engine = SweepEngine(processor, max_workers=workers, mode=mode)
+    with tracing.Trace(f"{mode} sweep").activate() as trace:
+        engine.run(processor.prodCapacities)
+    return {
+        "solver": engine.solver or processor.solver,
+        "wall_s": time.perf_counter() - trace.start,
+        "solve_s": trace.spans.get("scenario.solve", {}).get("total_s", 0.0),
+        "solves": trace.counters.get("solver.solves", 0),
+        "iterations": trace.counters.get("solver.iterations"),
+    }
+
+
+def sweep_savings(baseline, sweep):
+    """Returns the wall time, solver time and iterations a sweep saves compared to the baseline sweep."""
+    saved = {key: baseline[key] - sweep[key] for key in ("wall_s", "solve_s")}
+    if baseline["iterations"] is not None and sweep["iterations"] is not None:
+        saved["iterations"] = baseline["iterations"] - sweep["iterations"]
+    return saved
+
+
+def compare_warm_start(scenario_id, timestep_file, workers=1):
+    """
+    Solves the auto-simulate sweep of a scenario cold ("cells" mode), in "persistent" mode and
+    warm-started ("warm" mode), with the warm-start backend. Returns the three sweeps, what the
+    warm start saves against the cold sweep ("saved") and what the serpentine order saves against
+    the persistent sweep ("saved_by_order").
+    """
+    graph_data = load_graph_data(scenario_id, auto_simulate=True)
+    graph_data["sliderData"]["timestepFile"] = timestep_file
+    graph_data["sliderData"]["solver"] = solvers.WARM_START_SOLVER
+
+    cold = run_sweep(graph_data, "cells", workers)
+    persistent = run_sweep(graph_data, "persistent", workers)
+    warm = run_sweep(graph_data, "warm", workers)
+    return {
+        "cold": cold,
+        "persistent": persistent,
+        "warm": warm,
+        "saved": sweep_savings(cold, warm),
+        "saved_by_order": sweep_savings(persistent, warm),
+    }
+
+
+def compare_solvers(cases):
+    """
+    Returns the solve time of every backend per scenario, timestep file and mode:
+    the solve stage in single-cell mode, the whole sweep in auto-simulate mode.
+    """
+    comparison = {}
+    for case in cases:
+        key = f'{case["scenario"]}/{case["timestep_file"]}/{case["mode"]}'
+        stage_name = "solve" if case["mode"] == "single" else "sweep"
+        comparison.setdefault(key, {})[case["solver"]] = case["stages"][stage_name]["wall_s"]
+    return comparison
+
+
+def run(scenarios=None, timestep_files=TIMESTEP_FILES, modes=MODES, solver_names=None, repeat=1, workers=1, memory=True,
+        prune=False):
+    """Runs all cases and returns the report."""
+    scenarios = scenarios or list_scenarios()
+    solver_names = solver_names or [name for name in solvers.list_solvers() if solvers.is_available(name)]
+
+    # Warm up: workbook, profile store and abstract model are loaded once per process
+    for solver in solver_names:
+        graph_data = load_graph_data(scenarios[0])
+        graph_data["sliderData"]["solver"] = solver
+        run_single(graph_data, workers=1)
+
+    cases = [
+        run_case(scenario_id, timestep_file, mode, solver, repeat, workers, memory, prune)
+        for scenario_id in scenarios
+        for timestep_file in timestep_files
+        for mode in modes
+        for solver in solver_names
+    ]
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "workers": workers,
+        "prune": prune,
+        "cases": cases,
+        "solvers": compare_solvers(cases),
+    }
+    if "auto" in modes and solvers.is_available(solvers.WARM_START_SOLVER):
+        report["warm_start"] = {
+            f"{scenario_id}/{timestep_file}": compare_warm_start(scenario_id, timestep_file, workers)
+            for scenario_id in scenarios
+            for timestep_file in timestep_files
+        }
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["max_rss_mb"] = maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", help="ids of the bundled scenarios (default all)")
+    parser.add_argument("--timesteps", nargs="+", default=list(TIMESTEP_FILES), help="timestep files")
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument(
+        "--solver", nargs="+", choices=solvers.list_solvers(), help="solver backends (default all available)"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case, the median is reported")
+    parser.add_argument("--workers", type=int, default=1, help="sweep worker processes")
+    parser.add_argument("--prune", action="store_true", help="skip the sweep cells proven infeasible")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run(
+        args.scenario, args.timesteps, args.mode, args.solver, args.repeat, args.workers, not args.no_memory,
+        args.prune,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
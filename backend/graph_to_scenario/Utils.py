@@ -68,20 +68,7 @@ def load_default_technology_data(default_values_excel: str) -> dict:
         # Load the specified sheet
         df = load_excel(default_values_excel, "Technology")  # pandas dataframe
 
-        # Create a dictionary to store defaults
-        defaults = {}
-        for _, row in df.iterrows():
-            # Skip rows with an empty or missing "technology_type"
-            if pd.isna(row.get("technology_type")) or row.isnull().all():
-                continue
-
-            # Use the "technology_type" column as the key
-            tech_type = row["technology_type"].strip().lower()
-
-            # Convert the row to a dictionary of defaults (excluding the "technology_type" column)
-            defaults[tech_type] = row.drop("technology_type").to_dict()
-
-        return defaults
+        return parse_technology_data(df)
     except FileNotFoundError:
         print(f"Error: File not found at {default_values_excel}")
     except Exception as e:
@@ -89,6 +76,33 @@ def load_default_technology_data(default_values_excel: str) -> dict:
     return {}
 
 
+@staticmethod
+def parse_technology_data(df: pd.DataFrame) -> dict:
+    """
+    Converts the rows of the "Technology" sheet into a dictionary of defaults.
+
+    Args:
+        df (pd.DataFrame): The "Technology" sheet with cleaned column names.
+
+    Returns:
+        dict: A dictionary where the key is the technology type and the value is its defaults.
+    """
+    # Create a dictionary to store defaults
+    defaults = {}
+    for _, row in df.iterrows():
+        # Skip rows with an empty or missing "technology_type"
+        if pd.isna(row.get("technology_type")) or row.isnull().all():
+            continue
+
+        # Use the "technology_type" column as the key
+        tech_type = row["technology_type"].strip().lower()
+
+        # Convert the row to a dictionary of defaults (excluding the "technology_type" column)
+        defaults[tech_type] = row.drop("technology_type").to_dict()
+
+    return defaults
+
+
 @staticmethod
 def get_timestep(
     file_path: str, scenario_name: str = "default", sheet_name: str = "Timestep"
@@ -109,17 +123,7 @@ def get_timestep(
         df = load_excel(file_path, "Timestep")
 
         # Create a dictionary where the key is the scenario name and the value is the timestep
-        timesteps = {}
-        for _, row in df.iterrows():
-            # Skip rows with an empty or missing "scenario name"
-            if pd.isna(row.get("scenario name")) or row.isnull().all():
-                continue
-
-            # Use the "scenario name" column as the key
-            scenario = row["scenario name"].strip().lower()
-
-            # Store the timestep value
-            timesteps[scenario] = row["timestep"]
+        timesteps = parse_timestep_data(df)
 
         # Return the timestep for the requested scenario
         return timesteps.get(scenario_name.lower(), None)  # None if not found
@@ -128,3 +132,29 @@ def get_timestep(
     except Exception as e:
         print(f"Unexpected error: {e}")
     return None
+
+
+@staticmethod
+def parse_timestep_data(df: pd.DataFrame) -> dict:
+    """
+    Converts the rows of the "Timestep" sheet into a dictionary of timestep files.
+
+    Args:
+        df (pd.DataFrame): The "Timestep" sheet with cleaned column names.
+
+    Returns:
+        dict: A dictionary where the key is the lowercase scenario name and the value is its timestep file.
+    """
+    timesteps = {}
+    for _, row in df.iterrows():
+        # Skip rows with an empty or missing "scenario name"
+        if pd.isna(row.get("scenario name")) or row.isnull().all():
+            continue
+
+        # Use the "scenario name" column as the key
+        scenario = row["scenario name"].strip().lower()
+
+        # Store the timestep value
+        timesteps[scenario] = row["timestep"]
+
+    return timesteps
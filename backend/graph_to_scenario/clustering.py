@@ -0,0 +1,207 @@
+"""
+This file contains the clustering of the full-year profiles into representative periods.
+The year is split into periods (days by default), every period is described by the hourly values
+of all availability and demand profiles, and the periods are clustered with k-medoids or k-means.
+One real period represents every cluster: it is written as timestep file, and the number of periods
+of its cluster as weights file, which the model uses to scale the costs and the demand to the year.
+
+Usage (from the backend folder):
+    python -m graph_to_scenario.clustering --periods 8 [--method kmedoids] [--hours 24] [--seed 0]
+                                           [--name 8days] [--profile 2016_PVAvail_DE.txt ...] [--force]
+"""
+
+import argparse
+import numpy as np
+from pathlib import Path
+from . import profile_store, technology_catalog
+from .scenario import EXCEL_FILE_PATH, VOLUME_DATA_FOLDER
+
+METHODS = ("kmedoids", "kmeans")
+HOURS_PER_DAY = 24
+
+
+def get_period_features(store, profile_names, hours_per_period=HOURS_PER_DAY):
+    """
+    Returns one row per period with the hourly values of all profiles. Every profile is scaled
+    to its maximum, so that profiles of different units weigh the same.
+
+    Args:
+        store (ProfileStore): The profile store of the volume data folder.
+        profile_names (list): The names of the profile files.
+        hours_per_period (int): Number of hours of a period.
+
+    Returns:
+        np.ndarray: The features, periods x (hours_per_period * number of profiles).
+    """
+    profiles = [np.asarray(store.get_profile(name), dtype=np.float64) for name in profile_names]
+    periods = min(len(profile) for profile in profiles) // hours_per_period
+
+    columns = []
+    for profile in profiles:
+        profile = profile[: periods * hours_per_period]
+        scale = np.abs(profile).max()
+        if scale > 0:
+            profile = profile / scale
+        columns.append(profile.reshape(periods, hours_per_period))
+    return np.hstack(columns)
+
+
+def _squared_distances(features, centers):
+    """Returns the squared euclidean distances between every row of features and of centers."""
+    return ((features[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+
+
+def _init_indices(features, k, rng):
+    """Returns k row indices chosen by k-means++: every next row with probability of its squared distance."""
+    indices = [int(rng.integers(len(features)))]
+    for _ in range(1, k):
+        distances = _squared_distances(features, features[indices]).min(axis=1)
+        if distances.sum() == 0:  # fewer distinct rows than clusters
+            distances = np.ones(len(features))
+            distances[indices] = 0
+        indices.append(int(rng.choice(len(features), p=distances / distances.sum())))
+    return indices
+
+
+def kmeans(features, k, seed=0, max_iter=100):
+    """
+    Clusters the rows of features with Lloyd's k-means.
+
+    Args:
+        features (np.ndarray): One row per period.
+        k (int): Number of clusters.
+        seed (int): Seed of the initialization.
+        max_iter (int): Maximum number of iterations.
+
+    Returns:
+        tuple: The cluster of every row and the representative row of every cluster, the row
+            closest to the cluster mean.
+    """
+    centers = features[_init_indices(features, k, np.random.default_rng(seed))]
+    labels = None
+    for _ in range(max_iter):
+        new_labels = _squared_distances(features, centers).argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        for j in range(k):
+            if (labels == j).any():  # an empty cluster keeps its center
+                centers[j] = features[labels == j].mean(axis=0)
+
+    distances = _squared_distances(features, centers)
+    representatives = []
+    for j in range(k):
+        members = np.flatnonzero(labels == j)
+        representatives.append(int(members[distances[members, j].argmin()]) if len(members) else -1)
+    return labels, representatives
+
+
+def kmedoids(features, k, seed=0, max_iter=100):
+    """
+    Clusters the rows of features with k-medoids (alternating assignment and medoid update).
+
+    Args:
+        features (np.ndarray): One row per period.
+        k (int): Number of clusters.
+        seed (int): Seed of the initialization.
+        max_iter (int): Maximum number of iterations.
+
+    Returns:
+        tuple: The cluster of every row and the medoid of every cluster, the row with the
+            smallest sum of distances to the other rows of the cluster.
+    """
+    distances = np.sqrt(_squared_distances(features, features))
+    medoids = _init_indices(features, k, np.random.default_rng(seed))
+    for _ in range(max_iter):
+        labels = distances[:, medoids].argmin(axis=1)
+        new_medoids = []
+        for j, medoid in enumerate(medoids):
+            members = np.flatnonzero(labels == j)
+            if len(members) == 0:
+                new_medoids.append(medoid)
+            else:
+                new_medoids.append(int(members[distances[np.ix_(members, members)].sum(axis=1).argmin()]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+    return distances[:, medoids].argmin(axis=1), medoids
+
+
+def cluster_periods(features, k, method="kmedoids", seed=0):
+    """
+    Returns the representative periods of k clusters and their weights.
+
+    Args:
+        features (np.ndarray): One row per period, see get_period_features.
+        k (int): Number of representative periods.
+        method (str): One of METHODS.
+        seed (int): Seed of the initialization.
+
+    Returns:
+        tuple: The representative periods in chronological order, the number of periods each of them
+            represents, and the RMSE between every period and its representative.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method: {method}. Must be one of {METHODS}.")
+    if not 1 <= k <= len(features):
+        raise ValueError(f"Invalid number of periods: {k}. Must be between 1 and {len(features)}.")
+
+    labels, representatives = (kmedoids if method == "kmedoids" else kmeans)(features, k, seed)
+    counts = np.bincount(labels, minlength=k)
+    clusters = sorted((representatives[j], int(counts[j])) for j in range(k) if counts[j] > 0)
+
+    assigned = np.array(representatives)[labels]
+    rmse = float(np.sqrt(((features - features[assigned]) ** 2).mean()))
+    return [period for period, _ in clusters], [count for _, count in clusters], rmse
+
+
+def write_timestep_files(folder, name, periods, weights, hours_per_period=HOURS_PER_DAY):
+    """
+    Writes the timestep file of the representative periods (1-indexed hours of the year, one per line)
+    and its weights file (the number of periods every representative period stands for).
+
+    Returns:
+        tuple: The paths of the timestep file and of the weights file.
+    """
+    timesteps = [period * hours_per_period + hour + 1 for period in periods for hour in range(hours_per_period)]
+    timestep_path = Path(folder) / f"{name}.txt"
+    weights_path = Path(folder) / profile_store.get_weights_file_name(timestep_path.name)
+    timestep_path.write_text("\n".join(str(t) for t in timesteps) + "\n")
+    weights_path.write_text("\n".join(str(w) for w in weights) + "\n")
+    return timestep_path, weights_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--periods", type=int, required=True, help="number of representative periods")
+    parser.add_argument("--method", choices=METHODS, default="kmedoids")
+    parser.add_argument("--hours", type=int, default=HOURS_PER_DAY, help="hours per period (default a day)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the initialization")
+    parser.add_argument("--name", help="name of the timestep file without .txt (default <periods>periods)")
+    parser.add_argument("--profile", nargs="+", help="profile files (default all profiles of the technology defaults)")
+    parser.add_argument("--folder", default=str(VOLUME_DATA_FOLDER), help="volume data folder")
+    parser.add_argument("--force", action="store_true", help="overwrite existing files")
+    args = parser.parse_args()
+
+    name = args.name or f"{args.periods}periods"
+    if Path(name).name != name:
+        parser.error(f"Invalid name: {name}. Must be a plain file name.")
+    for path in (Path(args.folder) / f"{name}.txt", Path(args.folder) / profile_store.get_weights_file_name(f"{name}.txt")):
+        if path.exists() and not args.force:
+            parser.error(f"{path} exists, use --force to overwrite it.")
+
+    store = profile_store.get_store(args.folder)
+    profile_names = args.profile or technology_catalog.get_catalog(EXCEL_FILE_PATH).get_profile_names()
+    features = get_period_features(store, profile_names, args.hours)
+    periods, weights, rmse = cluster_periods(features, args.periods, args.method, args.seed)
+    timestep_path, weights_path = write_timestep_files(args.folder, name, periods, weights, args.hours)
+
+    print(f"Clustered {len(features)} periods of {args.hours} h of {', '.join(profile_names)} with {args.method}")
+    print(f"Representative periods (0-indexed): {periods}")
+    print(f"Weights: {weights}")
+    print(f"RMSE of the scaled profiles: {rmse:.4f}")
+    print(f"Wrote {timestep_path} and {weights_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,13 @@
 import pyomo.environ as pyo
 from pyomo.dataportal import DataPortal
 from pathlib import Path
-import json, os
+import json, os, threading
 
+import numpy as np
 import pandas as pd
 
+from . import solvers
+
 OPT_DEBUG = False  # Debugging flag
 
 
@@ -45,10 +48,15 @@ def get_abstract_pyomo_model(fix_capacities=False):
     model.availability_profile = pyo.Param(
         model.H, model.T, default=1
     )  # Availability Profile
+    model.timestep_weight = pyo.Param(
+        model.T, default=1
+    )  # Hours of the year a timestep represents, relative to a uniform sample (mean 1), e.g. for clustered days
 
     model.installed_capacity = pyo.Param(
-        model.H, model.N, default=0
-    )  # Installed Capacity --> rhis are the sliders values in the frontend
+        model.H, model.N, default=0, mutable=True
+    )  # Installed Capacity --> rhis are the sliders values in the frontend, mutable to re-solve with other slider values
+    model.is_free_capacity = pyo.Param(model.H, model.N, default=0)  # Capacity is optimized instead of fixed to the slider
+    model.max_capacity = pyo.Param(model.H, model.N, default=0)  # Upper bound of a free capacity (highest slider value)
 
     ## Dynamic Sets
     model.Ug = pyo.Set(
@@ -70,6 +78,28 @@ def get_abstract_pyomo_model(fix_capacities=False):
         initialize=lambda model: [(h, n) for (h, n) in model.Ug if model.record_curtailment[h]],
     )  # Generators that record curtailment --> Renewable Energy!
 
+    model.Ufree = pyo.Set(
+        within=model.Ug,
+        initialize=lambda model: [(h, n) for (h, n) in model.Ug if model.is_free_capacity[h, n]],
+    )  # Generators with a free capacity, optimized within the slider range
+
+    # Per node unit indexes, so that node balances only visit the units at the node
+    def unit_index_rule(model):
+        model.units_by_node = {"g": {}, "c": {}}
+        for key, units in (("g", model.Ug), ("c", model.Uc)):
+            for (h, n) in units:
+                model.units_by_node[key].setdefault(n, []).append(h)
+    model.unit_index = pyo.BuildAction(rule=unit_index_rule)
+
+    model.Hg = pyo.Set(
+        model.N, within=model.H,
+        initialize=lambda model, n: model.units_by_node["g"].get(n, []),
+    )  # Generator technologies at each node
+    model.Hc = pyo.Set(
+        model.N, within=model.H,
+        initialize=lambda model, n: model.units_by_node["c"].get(n, []),
+    )  # Consumer technologies at each node
+
     ## Variables ##
 
     # Cost Variables
@@ -113,45 +143,42 @@ def get_abstract_pyomo_model(fix_capacities=False):
 
     def penalty_rule(model):
         pfac = 1e6
-        return model.PENALTY == sum(
-            model.nSPd[h, n, t] * pfac for (h, n) in model.Uc for t in model.T
+        return model.PENALTY == pyo.quicksum(
+            model.nSPd[h, n, t] * pfac * model.timestep_weight[t] for (h, n) in model.Uc for t in model.T
         )
     model.penalty_eq = pyo.Constraint(rule=penalty_rule)
 
     def capex_rule(model):
         # Capex already normalized by lifetime
-        return model.CAPEX == sum(
+        return model.CAPEX == pyo.quicksum(
             model.Cg[h, n] * model.capacity_cost[h] / model.operational_lifetime[h]
-            for h in model.H
-            for n in model.N
-            if (h, n) in model.Ug
+            for (h, n) in model.Ug
         )
     model.capex_eq = pyo.Constraint(rule=capex_rule)
 
     def opex_rule(model):
         # Cost on the modelled time period
-        period_cost = sum(
-            model.Pg[h, n, t] * model.operational_cost[h]
-            for h in model.H
-            for n in model.N
-            if (h, n) in model.Ug
+        period_cost = pyo.quicksum(
+            model.Pg[h, n, t] * model.operational_cost[h] * model.timestep_weight[t]
+            for (h, n) in model.Ug
             for t in model.T
         )
-        # Extrapolated for full year
+        # Extrapolated for full year, the weights of the timesteps have mean 1
         factor = 24 * 365 / len(model.T)
         return model.OPEX == period_cost * factor
     model.opex_eq = pyo.Constraint(rule=opex_rule)
 
     # Power Balance Equations
     def global_power_balance_rule(model, t):
-        return sum(model.Pi[n, t] for n in model.N) == 0
+        return pyo.quicksum(model.Pi[n, t] for n in model.N) == 0
     model.global_power_balance_eq = pyo.Constraint(
         model.T, rule=global_power_balance_rule
     )
 
     def local_power_balance_rule(model, n, t):
-        production = sum(model.Pg[h, n, t] for h in model.H if (h, n) in model.Ug)
-        consumption = sum(model.Pd[h, n, t] for h in model.H if (h, n) in model.Uc)
+        # Only a few units per node, a plain sum is cheaper than quicksum here
+        production = sum(model.Pg[h, n, t] for h in model.Hg[n])
+        consumption = sum(model.Pd[h, n, t] for h in model.Hc[n])
         return production - consumption == model.Pi[n, t]
     model.local_power_balance_eq = pyo.Constraint(
         model.N, model.T, rule=local_power_balance_rule
@@ -160,12 +187,12 @@ def get_abstract_pyomo_model(fix_capacities=False):
     # Energy Supplied
     def energy_supplied_rule(model):
          year_factor = 24 * 365 / len(model.T) 
-         return model.EnergySupTot == sum(model.Pd[h,n,t] for (h,n) in model.Uc for t in model.T)*year_factor
+         return model.EnergySupTot == pyo.quicksum(model.Pd[h,n,t] * model.timestep_weight[t] for (h,n) in model.Uc for t in model.T)*year_factor
     model.energy_supplied_eq = pyo.Constraint(rule=energy_supplied_rule)
 
     # Unmet Demand
     def unmet_demand_rule(model):
-        return model.UnmetDemand == sum(model.nSPd[h,n,t] for (h,n) in model.Uc for t in model.T)
+        return model.UnmetDemand == pyo.quicksum(model.nSPd[h,n,t] for (h,n) in model.Uc for t in model.T)
     model.unmet_demand_eq = pyo.Constraint(rule=unmet_demand_rule)
    
     # Capacity Equations
@@ -173,6 +200,8 @@ def get_abstract_pyomo_model(fix_capacities=False):
     if fix_capacities:
 
         def fix_capacity_rule(model, h, n):
+            if (h, n) in model.Ufree:
+                return pyo.Constraint.Skip
             return model.Cg[h, n] == model.installed_capacity[h, n]
 
         model.fix_capacity_eq = pyo.Constraint(model.Ug, rule=fix_capacity_rule)
@@ -189,6 +218,12 @@ def get_abstract_pyomo_model(fix_capacities=False):
 
     model.capacity_eq = pyo.Constraint(model.Ug, model.T, rule=capacity_rule)
 
+    # Free capacities stay within the slider range
+    def free_capacity_rule(model, h, n):
+        return model.Cg[h, n] <= model.max_capacity[h, n]
+
+    model.free_capacity_eq = pyo.Constraint(model.Ufree, rule=free_capacity_rule)
+
     # Storage Equations 
     def storage_operation_rule(model, h, n, t ): 
         if t == model.T.first():
@@ -207,6 +242,8 @@ def get_abstract_pyomo_model(fix_capacities=False):
 
 
     # Load Profiles
+    # The demand profile is normalized so that the sum of timestep_weight * demand_profile is 1,
+    # the weighted demand of the modelled timesteps is the yearly demand
     def demand_profile_rule(model, h, n, t):
         year_factor = 24 * 365 / len(model.T)
         try:
@@ -239,6 +276,28 @@ def get_abstract_pyomo_model(fix_capacities=False):
 
     return model
 
+_abstract_models = threading.local()  # abstract models built by the current thread
+
+def get_cached_abstract_pyomo_model(fix_capacities=False):
+    """
+    Returns the abstract model of the given flavour, declared once per thread and reused for every solve.
+
+    create_instance() clones the abstract model, so it is not changed by building instances.
+    The cache is per thread, as Pyomo components are not safe to clone from several threads at once.
+
+    Args:
+        fix_capacities: Same as in get_abstract_pyomo_model
+
+    Returns:
+        The abstract Pyomo model
+    """
+    models = getattr(_abstract_models, "models", None)
+    if models is None:
+        models = _abstract_models.models = {}
+    if fix_capacities not in models:
+        models[fix_capacities] = get_abstract_pyomo_model(fix_capacities=fix_capacities)
+    return models[fix_capacities]
+
 def load_input(model, dat_file="test.dat"):
     # Get the absolute path of the .dat file in the current folder
     dat_file_path = Path(__file__).parent / dat_file
@@ -272,11 +331,37 @@ def load_input_from_temp_file(model, dat_file_path):
         os.remove(dat_file_path)  # Ensure cleanup even if an error occurs
         print(f"DEBUG: Temp file {dat_file_path} deleted.")
 
-def solve_instance(model_instance):
-    solver = pyo.SolverFactory("glpk")
-    results = solver.solve(model_instance, tee=True)
+def load_input_from_data(model, data):
+    """
+    Creates a Pyomo model instance directly from in-memory data.
+
+    Args:
+        model: The abstract Pyomo model
+        data: Nested dict as returned by AbstractModelInput.to_pyomo_data()
 
-    return model_instance
+    Returns:
+        The Pyomo model instance
+    """
+    return model.create_instance(data=data)
+
+def get_solver(name=None):
+    """Returns the solver used for the optimization, a backend of the solver registry (default is glpk)"""
+    return solvers.get_solver(name)
+
+def solve_instance(model_instance, solver=None, tee=False):
+    """
+    Solves the model instance in place.
+    The solver output is not streamed to the console, the glpk log is captured in the statistics.
+
+    Args:
+        model_instance: The Pyomo model instance
+        solver: Solver to reuse, e.g. a persistent solver kept for a sweep (default is a new solver)
+        tee: Whether to stream the solver output to the console (default is False)
+
+    Returns:
+        solvers.SolveStats: Termination condition, objective, wall time, iterations and model size of the solve
+    """
+    return solvers.solve(model_instance, solver, tee=tee)
 
 def get_variable_value(instance, var_name):
     """Returns a list with the values of a variable"""
@@ -300,21 +385,64 @@ def get_indexed_variable_value(instance, var_name, index_names=None):
     
    """
 
-    indexes = getattr(instance, var_name).index_set()
-    ret = []
-    for idx in indexes:
-         var = getattr(instance, var_name)[idx]
-         ret.append( (*idx, pyo.value(var)))
-    
-    if index_names is not None:
-        df = pd.DataFrame(ret, columns=index_names + [var_name])
+    arrays = get_indexed_variable_arrays(instance, var_name)
+    return frame_from_arrays(arrays, var_name, index_names)
+
+def get_indexed_variable_arrays(instance, var_name):
+    """Returns the indexes and values of a variable as NumPy arrays, extracted in one pass
+
+      Each index position is returned as integer codes into an array of its distinct values (levels),
+      e.g. for "Pg" the levels of the first position are the technologies.
+
+      Args:
+         instance: Pyomo instance
+         var_name: Name of the variable
+
+      Returns:
+         Tuple (codes, levels, values): a list with an int64 code array per index position,
+         a list with the level array per index position and the float64 values (NaN if not solved)
+   """
+    var = getattr(instance, var_name)
+    values = np.array([v.value for v in var.values()], dtype=np.float64)  # None -> NaN
+
+    dim = var.dim()
+    keys = list(var.keys())
+    if dim == 1:
+        columns = [keys]
+    else:
+        columns = list(zip(*keys)) if keys else [() for _ in range(dim)]
+
+    codes, levels = [], []
+    for column in columns:
+        column_codes, column_levels = pd.factorize(pd.Series(column, dtype=object), sort=False)
+        codes.append(column_codes.astype(np.int64))
+        levels.append(np.asarray(pd.Series(column_levels).infer_objects()))
+    return codes, levels, values
+
+def frame_from_arrays(arrays, var_name, index_names=None):
+    """Builds the DataFrame of a variable from the arrays of get_indexed_variable_arrays
+
+      Args:
+         arrays: Tuple (codes, levels, values)
+         var_name: Name of the variable, used as name of the value column
+         index_names: Names of the indexes in the DataFrame
+
+      Returns:
+         DataFrame with the values of the variable
+   """
+    codes, levels, values = arrays
+    if index_names is None:
+        names = list(range(len(codes) + 1))
+        var_name = len(codes)
     else:
-         df = pd.DataFrame(ret)
-    return df
+        names = list(index_names)
+    data = {name: level[code] for name, code, level in zip(names, codes, levels)}
+    data[var_name] = values
+    return pd.DataFrame(data)
 
 if __name__ == "__main__":
     model = get_abstract_pyomo_model()
     instance = load_input(model)
-    instance = solve_instance(instance)
+    print(solve_instance(instance, tee=True))
 
     pass
@@ -29,6 +29,10 @@ class ModelSet:
                 f.write(f"{v} \n")
         f.write("; \n\n")
 
+    def to_data(self):
+        # Set members as accepted by create_instance(data=...)
+        return list(self.val)
+
     def __repr__(self) -> str:
         return f"SET:{self.name}"
 
@@ -48,6 +52,7 @@ class ModelParam:
             self.dim = self.dim + s.dim
             self.set_names.append(s.name)
         self.vals = dict()
+        self.keys = dict()  # typed key for each key in vals
         self.sf = scaling_factor
 
     def add_value(self, value, key=None):
@@ -58,6 +63,7 @@ class ModelParam:
             key = self.is_key_valid(key)
             nkey = " ".join([str(x) for x in key])
             self.vals[str(nkey)] = value * self.sf
+            self.keys[str(nkey)] = key[0] if self.dim == 1 else tuple(key)
 
     def is_key_valid(self, key):
         # Verify if key is a valid key
@@ -116,6 +122,33 @@ class ModelParam:
        
         f.write(";\n\n")  # Ensure a semicolon at the end of normal parameters
 
+    def to_data(self):
+        """
+        Returns the values as accepted by create_instance(data=...), with the same
+        content as written by write(): NaN values are skipped and 2D tables are dense.
+        """
+        if not self.vals:
+            return None
+
+        if self.dim == 0:
+            return {None: self.vals}
+
+        elif self.dim == 1:
+            return {
+                self.keys[k]: v for k, v in self.vals.items() if not math.isnan(v)
+            }
+
+        elif self.dim == 2:
+            # Same table as in the .dat file, missing (row, col) pairs are 0
+            rows = dict.fromkeys(self.keys[k][0] for k in self.vals)
+            cols = dict.fromkeys(self.keys[k][1] for k in self.vals)
+            data = {(r, c): 0 for r in rows for c in cols}
+            for k, v in self.vals.items():
+                data[self.keys[k]] = v
+            return data
+
+        raise ValueError(f"Parameter {self.name} has a dimension greater than 2. Pyomo does not support this!")
+
 class AbstractModelInput(ABC):
     def __init__(self) -> None:
         self._sets = []
@@ -209,6 +242,20 @@ class AbstractModelInput(ABC):
         finally:
             temp_file.close()  # Close file so Pyomo can read it
 
+    def to_pyomo_data(self):
+        """
+        Returns the sets and parameters in the nested dict format of AbstractModel.create_instance(data=...),
+        so an instance can be built without writing and parsing a .dat file.
+        """
+        data = {}
+        for s in self._sets:
+            data[s.name] = s.to_data()
+        for p in self._params:
+            values = p.to_data()
+            if values is not None:
+                data[p.name] = values
+        return {None: data}
+
     def get_paramnames_indexed_by_set(self, set_name):
         """
         Set name can either be a list or a single string
@@ -243,7 +290,10 @@ class OptNetworkInput(AbstractModelInput):
             is_storage=[self["H"]],
             record_curtailment=[self["H"]],
             availability_profile=[self["H"], self["T"]],
+            timestep_weight=[self["T"]], #weights of clustered timesteps
             installed_capacity =[self["H"], self["N"]], #slider values
+            is_free_capacity=[self["H"], self["N"]], #capacity optimized instead of fixed to the slider
+            max_capacity=[self["H"], self["N"]], #upper bound of a free capacity
             energy_capacity =[self["H"], self["N"]], #battery 
         )
 
@@ -267,6 +317,9 @@ class OptNetworkInput(AbstractModelInput):
             if isinstance(item, node_types.Timesteps):
                 if hasattr(item, "timesteps"):
                     self["T"].val = list(range(1,len(timesteps)+1))  # Use the correct attribute name
+                if item.timestep_weight is not None:
+                    for t, weight in enumerate(item.timestep_weight):
+                        self["timestep_weight"].add_value(float(weight), t+1) #+1 for 1-indexing
                 continue  # Skip the rest of the loop for Timesteps
 
             node_id = item.node_id
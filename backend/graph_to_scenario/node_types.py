@@ -22,6 +22,10 @@ class Producer:
         Flag to record curtailment.
     is_producer : int
         Flag to indicate the node is a producer.
+    is_free_capacity : int
+        Flag to optimize the capacity within 0 and max_capacity instead of fixing it to installed_capacity.
+    max_capacity : float
+        Upper bound of a free capacity.
     """
     def __init__(
         self,
@@ -33,6 +37,8 @@ class Producer:
         availability_profile,
         installed_capacity, 
         record_curtailment, 
+        free_capacity=False,
+        max_capacity=0,
     ):
         """
         Constructs all the necessary attributes for the Producer object.
@@ -55,6 +61,10 @@ class Producer:
             Installed capacity of the producer.
         record_curtailment : bool
             Flag to record curtailment.
+        free_capacity : bool
+            Whether the capacity is optimized instead of fixed (default is False).
+        max_capacity : float
+            Upper bound of a free capacity (default is 0).
         """
         self.node_id = node_id
         self.technology = technology
@@ -65,6 +75,9 @@ class Producer:
         self.installed_capacity = installed_capacity #slider value
         self.record_curtailment = record_curtailment
         self.is_producer = 1
+        if free_capacity:  # only free producers add the parameters, the others keep the defaults of the model
+            self.is_free_capacity = 1
+            self.max_capacity = max_capacity
 
     def __repr__(self):
         """
@@ -208,8 +221,10 @@ class Timesteps:
     ----------
     timesteps : list
         List of timesteps.
+    timestep_weight : list
+        Weight of every timestep relative to a uniform sample of the year, None if all weights are 1.
     """
-    def __init__(self, timesteplist):
+    def __init__(self, timesteplist, weights=None):
         """
         Constructs all the necessary attributes for the Timesteps object.
 
@@ -217,8 +232,11 @@ class Timesteps:
         ----------
         timesteplist : list
             List of timesteps.
+        weights : list, optional
+            Weight of every timestep relative to a uniform sample of the year (default is None, all 1).
         """
         self.timesteps = timesteplist
+        self.timestep_weight = weights
 
     def __repr__(self):
         """
@@ -0,0 +1,159 @@
+"""
+This file contains the profile store for the availability and demand time series.
+Each text profile is converted once into a binary .npy file next to the volume data,
+which is then memory-mapped, so the full-year files are never parsed per request.
+
+A timestep file can have a weights file (e.g. 8days.weights.txt for 8days.txt) with one weight
+per period, e.g. the number of days a representative day stands for, see clustering.py.
+"""
+
+import os, tempfile, threading
+import numpy as np
+from pathlib import Path
+
+CACHE_FOLDER_NAME = ".profile_cache"
+WEIGHTS_SUFFIX = ".weights.txt"
+
+
+def get_weights_file_name(timestep_file):
+    """Returns the name of the weights file of a timestep file."""
+    return f"{Path(timestep_file).stem}{WEIGHTS_SUFFIX}"
+
+
+class ProfileStore:
+    """
+    A class to serve profiles and timestep indices of a volume data folder as NumPy arrays.
+
+    Attributes:
+    ----------
+    volume_data_folder : Path
+        The folder containing the text profiles and timestep files.
+    cache_folder : Path
+        The folder where the converted .npy files are stored.
+    """
+
+    def __init__(self, volume_data_folder, cache_folder=None):
+        """
+        Constructs the profile store.
+
+        Parameters:
+        ----------
+        volume_data_folder : str or Path
+            The folder containing the text profiles and timestep files.
+        cache_folder : str or Path, optional
+            The folder for the .npy files (default is a hidden folder inside volume_data_folder).
+        """
+        self.volume_data_folder = Path(volume_data_folder)
+        self.cache_folder = (
+            Path(cache_folder) if cache_folder else self.volume_data_folder / CACHE_FOLDER_NAME
+        )
+        self._arrays = {}  # file name -> (mtime, array)
+        self._lock = threading.Lock()
+
+    def _convert(self, text_file_path, npy_file_path, dtype):
+        """Parses a whitespace separated text file and stores it as .npy, returns the array."""
+        data = np.loadtxt(text_file_path, dtype=dtype, ndmin=1)
+        try:
+            self.cache_folder.mkdir(exist_ok=True)
+            # Write to a temporary file first, other worker processes may read the file at the same time
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_folder, suffix=".npy")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, npy_file_path)
+        except OSError as e:
+            print(f"Could not write profile cache {npy_file_path}: {e}")
+        return data
+
+    def _get_array(self, file_name, dtype, mmap):
+        """Returns the array of a text file, converting it if the .npy file is missing or outdated."""
+        text_file_path = self.volume_data_folder / file_name
+        mtime = os.stat(text_file_path).st_mtime  # raises FileNotFoundError
+
+        with self._lock:
+            cached = self._arrays.get(file_name)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            npy_file_path = self.cache_folder / f"{file_name}.npy"
+            if npy_file_path.exists() and os.stat(npy_file_path).st_mtime >= mtime:
+                data = np.load(npy_file_path, mmap_mode="r" if mmap else None)
+            else:
+                data = self._convert(text_file_path, npy_file_path, dtype)
+
+            self._arrays[file_name] = (mtime, data)
+            return data
+
+    def get_profile(self, profile_name):
+        """
+        Returns the full profile as a read-only, memory-mapped float64 array.
+
+        Args:
+            profile_name (str): The name of the profile file.
+
+        Returns:
+            np.ndarray: The values of the profile.
+        """
+        return self._get_array(profile_name, np.float64, mmap=True)
+
+    def get_indices(self, timestep_file):
+        """
+        Returns the timestep indices of a timestep file (1-indexed).
+
+        Args:
+            timestep_file (str): The name of the timestep file.
+
+        Returns:
+            np.ndarray: The timestep indices as int64 array.
+        """
+        return self._get_array(timestep_file, np.int64, mmap=False)
+
+    def get_weights(self, timestep_file):
+        """
+        Returns the weights of the timesteps of a timestep file relative to a uniform sample of the
+        year (mean 1). The timesteps are split into as many periods of equal length as the weights
+        file has weights, and every timestep gets the weight of its period.
+
+        Args:
+            timestep_file (str): The name of the timestep file.
+
+        Returns:
+            np.ndarray: The weights as float64 array, None if the timestep file has no weights file.
+
+        Raises:
+            ValueError: If the timesteps cannot be split into the periods of the weights file.
+        """
+        weights_file = get_weights_file_name(timestep_file)
+        if not (self.volume_data_folder / weights_file).is_file():
+            return None
+
+        period_weights = self._get_array(weights_file, np.float64, mmap=False)
+        timesteps = len(self.get_indices(timestep_file))
+        if len(period_weights) == 0 or timesteps % len(period_weights) or (period_weights <= 0).any():
+            raise ValueError(
+                f"Invalid weights file {weights_file}: {len(period_weights)} positive weights "
+                f"cannot be split over {timesteps} timesteps."
+            )
+        weights = np.repeat(period_weights, timesteps // len(period_weights))
+        return weights / weights.mean()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(volume_data_folder) -> ProfileStore:
+    """
+    Returns the profile store of a volume data folder, shared by all scenarios of the process.
+
+    Args:
+        volume_data_folder (str or Path): The folder containing the text profiles and timestep files.
+
+    Returns:
+        ProfileStore: The store of the folder.
+    """
+    key = str(Path(volume_data_folder).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ProfileStore(key)
+        return _stores[key]
@@ -1,16 +1,63 @@
 from pathlib import Path
 import math, json
+import numpy as np
 import pandas as pd
 from .node_types import Producer, Consumer, Battery, Timesteps
 from . import Utils
+from . import technology_catalog
+from . import profile_store
 from . import model_input
 from . import model as opt
+from . import tracing
+
+# Debugging flag: pass the model input through a temporary .dat file instead of building the instance directly
+USE_DAT_FILE = False
+
+# Slider value of the max_installed_capacity of a technology, slider values can be fractional
+MAX_SLIDER_VALUE = 5
+
+# folder paths
+VOLUME_DATA_FOLDER = Path(__file__).parent / "volume_data"
+EXCEL_FILE_PATH = VOLUME_DATA_FOLDER / "Technology_defaults.xlsx"
+
+
+def get_timestep_file(graph_data, scenario_name="default", excel_file_path=EXCEL_FILE_PATH, volume_data_folder=VOLUME_DATA_FOLDER):
+    """
+    Returns the timestep file of a request: the optional "timestepFile" of the slider data,
+    e.g. "4ThinWeeks.txt", or else the timestep file of the scenario name in the excel file.
+
+    Args:
+        graph_data (dict): The scenario and slider JSON from frontend.
+        scenario_name (str): The name of the scenario in the excel file (default is "default").
+        excel_file_path (Path): The path to the excel file containing technology defaults.
+        volume_data_folder (Path): The folder containing the timestep files.
+
+    Returns:
+        str: The name of the timestep file.
+
+    Raises:
+        ValueError: If timestepFile is not the name of a file in the volume data folder.
+    """
+    timestep_file = (graph_data.get("sliderData") or {}).get("timestepFile")
+    if timestep_file is None:
+        return technology_catalog.get_catalog(excel_file_path).get_timestep(scenario_name)
+
+    # Only plain file names of the volume data folder are allowed, no paths
+    if (
+        not isinstance(timestep_file, str)
+        or Path(timestep_file).name != timestep_file
+        or not (Path(volume_data_folder) / timestep_file).is_file()
+    ):
+        raise ValueError(f"Invalid timestepFile: {timestep_file}. Must be a file in the volume data folder.")
+    return timestep_file
 
 
 class ScenarioResults:
-    def __init__(self, instance):
+    def __init__(self, instance, stats=None):
         # A solved instace of the model!
         self._instance = instance
+        # Statistics of the solve (solvers.SolveStats), kept after detach()
+        self.stats = stats
 
         # A dictionary of variables and their indexing sets
         # Not all vars are here, add as needed
@@ -27,6 +74,11 @@ class ScenarioResults:
             "Ecap": ["H", "N"],
         }
 
+        # Extracted values, filled on first access: variable name -> value (not indexed)
+        # or (codes, levels, values) arrays (indexed). The plot data is memoized in _frames.
+        self._cache = {}
+        self._frames = {}
+
         # NAme Constants
         self.STACK = "Order"
         self.VALUE = "Value"
@@ -40,24 +92,61 @@ class ScenarioResults:
         """
         return self._get_variable(variable_name)
 
+    # Public Methods
+    def detach(self):
+        """
+        Extracts all variables of _vars which were not extracted yet and releases the instance.
+        The results stay valid after the instance is modified or solved again.
+        """
+        for variable_name in self._vars:
+            self._extract(variable_name)
+        self._instance = None
+        return self
+
     # Private Methods
+    def _extract(self, variable_name):
+        """
+        Get the raw values of a variable, the instance is only read on the first access
+        """
+        if variable_name not in self._cache:
+            if self._instance is None:
+                raise ValueError(f"{variable_name} was not extracted before the results were detached")
+            with tracing.span("results.extract"):
+                # Check if the variable is indexed
+                if self._vars[variable_name] is None:
+                    self._cache[variable_name] = opt.get_variable_value(self._instance, variable_name)[0]
+                else:
+                    # Bulk extraction into NumPy columns, the frame is built from the columns
+                    self._cache[variable_name] = opt.get_indexed_variable_arrays(self._instance, variable_name)
+        return self._cache[variable_name]
+
     def _get_variable(self, variable_name):
         """
         Get the variable value from the instance
         """
-        # Check if the variable is indexed
+        values = self._extract(variable_name)
         if self._vars[variable_name] is None:
-            return opt.get_variable_value(self._instance, variable_name)[0]
-        else:
-            return opt.get_indexed_variable_value(
-                self._instance, variable_name, self._vars[variable_name]
-            )
+            return values
+        return opt.frame_from_arrays(values, variable_name, self._vars[variable_name])
+
+    def _get_frame(self, key, build):
+        """
+        Returns the memoized result of build(). Data frames are returned as shallow copies,
+        so callers can add or rename columns without changing the memoized frame.
+        """
+        if key not in self._frames:
+            self._frames[key] = build()
+        frame = self._frames[key]
+        return frame.copy(deep=False) if isinstance(frame, pd.DataFrame) else frame
 
     # Plot Methods
     def get_generation_conusmption_plot_data(self):
         """
         Get the generation and consumption data for plotting in a stacked bar chart as Data Frame
         """
+        return self._get_frame("generation_consumption", self._generation_conusmption_plot_data)
+
+    def _generation_conusmption_plot_data(self):
         # Get the generation and consumption data
 
         generation = self["Pg"].rename(columns={"Pg": self.VALUE})
@@ -89,7 +178,9 @@ class ScenarioResults:
         """
         Get the storage level data for plotting in a line chart as Data Frame
         """
-        return self["Es"].rename(columns={"Es": self.VALUE})
+        return self._get_frame(
+            "storage_level", lambda: self["Es"].rename(columns={"Es": self.VALUE})
+        )
 
     def get_heatmap_plot_data(self):
         """
@@ -97,6 +188,9 @@ class ScenarioResults:
         It is the avarage cost electricity supply, if all demand is met.
         Otherwise this is inf.
         """
+        return self._get_frame("heatmap", self._heatmap_plot_data)
+
+    def _heatmap_plot_data(self):
         total_costs = self["TOTEX"]
         energy_supplied = self["EnergySupTot"]
         unmet_demand = self["UnmetDemand"]
@@ -112,6 +206,9 @@ class ScenarioResults:
         """
         Get the capacities of the producers and batteries
         """
+        return self._get_frame("capacities", self._capacities)
+
+    def _capacities(self):
         generation = self["Cg"].rename(columns={"Cg": self.VALUE})
         storage = self["Ecap"].rename(columns={"Ecap": self.VALUE})
 
@@ -132,6 +229,8 @@ class Scenario:
         The timestep from the excel file.
     timesteps : list
         List of timesteps.
+    timestep_weights : np.ndarray
+        Weights of the timesteps relative to a uniform sample of the year, None if they are all 1.
     graph_data : dict
         The scenario and slider JSON from frontend.
     reset_flag : bool
@@ -150,8 +249,12 @@ class Scenario:
         The path to the excel file containing technology defaults.
     volume_data_folder : Path
         The path to the volume data folder.
+    solver_name : str
+        The solver backend of the solver registry, None for the default backend.
+    free_capacities : list
+        Ids of the producer nodes (e.g. "node_1") whose capacity is optimized within the slider range.
     """
-    def __init__(self, graph_data):
+    def __init__(self, graph_data, solve=True, solver_name=None, free_capacities=None):
         """
         Constructs all the necessary attributes for the Scenario object.
 
@@ -159,36 +262,53 @@ class Scenario:
         ----------
         graph_data : dict
             The scenario and slider JSON from frontend.
+        solve : bool
+            Whether to optimize the scenario right away (default is True).
+        solver_name : str, optional
+            The solver backend, e.g. "glpk" or "highs" (default is solvers.DEFAULT_SOLVER).
+        free_capacities : list, optional
+            Ids of the producer nodes whose capacity is optimized between 0 and the capacity
+            of the highest slider value instead of fixed to the slider (default is None).
         """
         self.nodes = []  # contains nodes parsed from json sent from frontend
         self.edges = []  # contains edges parsed from json sent from frontend
         self.timestepfile_chosen = None  # the timestep from the excel file
         self.timesteps = []
+        self.timestep_weights = None  # weights of the timesteps, None unless the timestep file has a weights file
         self.graph_data = graph_data  # the scenario+slider json from frontend
         self.reset_flag = False
         self.auto_simulate_flag = False
         self.prodCapacities = []
         self.modified_slider_values = []
         self.final_instance = None
+        self.instance = None  # model instance kept by resolve() to re-solve with other slider values
+        self.solver = None  # solver kept by resolve()
+        self.solver_name = solver_name
+        self.free_capacities = list(free_capacities or [])
         # folder paths
         self.current_dir = Path(__file__).parent
-        self.excel_file_path = (
-            self.current_dir / "volume_data" / "Technology_defaults.xlsx"
-        )
-        self.volume_data_folder = self.current_dir / "volume_data"
-        self.initialize()
+        self.excel_file_path = EXCEL_FILE_PATH
+        self.volume_data_folder = VOLUME_DATA_FOLDER
+        self.initialize(solve=solve)
 
-    def initialize(self):
+    def initialize(self, solve=True):
         """
         Initializes the Scenario class by processing the graph data and getting the default node values.
+        The scenario is optimized if solve is True.
         """
         
-        self.get_time_steps()
-        self.get_default_node_values()
-        self.get_slider_data()
-        self.process_graph_data()
-        self.get_edges()
-        self.optimize()
+        with tracing.span("scenario.get_time_steps"):
+            self.get_time_steps()
+        with tracing.span("scenario.get_default_node_values"):
+            self.get_default_node_values()
+        with tracing.span("scenario.get_slider_data"):
+            self.get_slider_data()
+        with tracing.span("scenario.process_graph_data"):
+            self.process_graph_data()
+        with tracing.span("scenario.get_edges"):
+            self.get_edges()
+        if solve:
+            self.optimize()
         #self.print_nodes()
 
     def process_graph_data(self):
@@ -257,6 +377,8 @@ class Scenario:
                                 node["label"], node["id"]
                             ),  # gets slider value for a node
                             record_curtailment=tech_defaults.get("record_curtailment"),
+                            free_capacity=node["id"] in self.free_capacities,
+                            max_capacity=tech_defaults.get("max_installed_capacity"),
                         )
                     )
                 elif node_type == "consumer":
@@ -280,7 +402,7 @@ class Scenario:
                         )
                     )
             self.nodes.append(
-                Timesteps(timesteplist=self.timesteps)
+                Timesteps(timesteplist=self.timesteps, weights=self.timestep_weights)
             )  # at end append timestep list
         except Exception as e:
             print(f"Error processing graph data: {e}")
@@ -288,17 +410,18 @@ class Scenario:
     def get_default_node_values(self):
         """Gets the default values for the nodes from the excel file
         and stores as a dictionary in self.defaults"""
-        self.defaults = Utils.load_default_technology_data(self.excel_file_path)
+        self.defaults = technology_catalog.get_catalog(self.excel_file_path).get_defaults()
 
     def get_time_steps(self, scenario_name="default"):
         """
         Gets the timestep for a specific scenario name from excel file and saves it to self.timestepfile_chosen.
+        A "timestepFile" in the slider data overrides the excel file.
 
         Parameters:
             scenario_name (str): The name of the scenario to fetch the timestep for (default is "default").
         """
-        self.timestepfile_chosen = Utils.get_timestep(
-            self.excel_file_path, scenario_name
+        self.timestepfile_chosen = get_timestep_file(
+            self.graph_data, scenario_name, self.excel_file_path, self.volume_data_folder
         )
 
 
@@ -360,7 +483,7 @@ class Scenario:
             max_capacity = tech_defaults.get("max_installed_capacity")
 
             # Calculate the multiplier and adjusted capacity
-            multiplier = max_capacity / 5
+            multiplier = max_capacity / MAX_SLIDER_VALUE
             adjusted_capacity = multiplier * slider_value
 
             return adjusted_capacity
@@ -372,6 +495,25 @@ class Scenario:
             )
             return 0
 
+    def capacity_to_slider_value(self, node_name, capacity):
+        """
+        Returns the slider value of an installed capacity, the inverse of installed_capacity_adjuster.
+
+        Parameters:
+        ----------
+        node_name : str
+            The name (technology) of the node.
+        capacity : float
+            The installed capacity.
+
+        Returns:
+        -------
+        float
+            The slider value, between 0 and MAX_SLIDER_VALUE for capacities in the slider range.
+        """
+        max_capacity = self.defaults.get(node_name.lower()).get("max_installed_capacity")
+        return capacity / max_capacity * MAX_SLIDER_VALUE
+
     def process_profile(self, profile_name, profile_type):
         """
         Processes the profile file based on the given profile name and selected timesteps. Availability profiles are processed differently from demand profiles. Demand profiles must be normalized to sum 1, otherwise model renders infeasible.
@@ -381,7 +523,7 @@ class Scenario:
             profile_type (str): The type of profile to process (availability or demand).
 
         Returns:
-            list: Processed and formatted array or data structure.
+            np.ndarray: Processed and rounded array, or an empty list on error.
         """
         try:
             # Handle empty or NaN profile_name
@@ -391,31 +533,26 @@ class Scenario:
                 # print(f"Skipping invalid profile_name: {profile_name}")
                 return []
 
-            # Construct paths using pathlib
-            profile_file_path = self.volume_data_folder / profile_name
-            indices_file_path = self.volume_data_folder / self.timestepfile_chosen
-
-            # Read and process the profile data
-            with open(profile_file_path, "r") as profile_file:
-                profile_data = [float(value) for value in profile_file.read().split()]
-
-            # Read and process the indices data
-            with open(indices_file_path, "r") as indices_file:
-                indices = [int(index.strip()) for index in indices_file.readlines()]
-                self.timesteps = indices  # assign timesteps from file to list
+            # Profiles and timestep indices are served as arrays by the shared profile store
+            store = profile_store.get_store(self.volume_data_folder)
+            profile_data = store.get_profile(profile_name)
+            indices = store.get_indices(self.timestepfile_chosen)
+            self.timesteps = indices.tolist()  # assign timesteps from file to list
+            self.timestep_weights = store.get_weights(self.timestepfile_chosen)
 
             # Extract the corresponding values
-            selected_data = [
-                profile_data[i - 1] for i in indices
-            ]  # timesteps are not 0 index
+            selected_data = profile_data[indices - 1]  # timesteps are not 0 index
 
             # Normalize the demand profile if necessary
             if profile_type.lower() == "demand":
-                # Normalize the demand profile to sum to 1
-                sum_values = sum(selected_data)
+                # Normalize the demand profile to sum to 1, weighted by the timestep weights if any
+                if self.timestep_weights is not None:
+                    sum_values = (selected_data * self.timestep_weights).sum()
+                else:
+                    sum_values = selected_data.sum()
                 if sum_values == 0:
                     raise ValueError("Sum of demand profile values is zero.")
-                selected_data = [value / sum_values for value in selected_data]
+                selected_data = selected_data / sum_values
             elif profile_type.lower() == "availability":
                 # Availability profiles are not normalized
                 pass
@@ -424,8 +561,8 @@ class Scenario:
                     f"Invalid profile type: {profile_type}. Must be 'demand' or 'availability'."
                 )
 
-            # Format the values to six decimal places
-            formatted_data = [f"{value:.6f}" for value in selected_data]
+            # Round the values to six decimal places
+            formatted_data = np.round(selected_data, 6)
 
             return formatted_data
 
@@ -442,22 +579,79 @@ class Scenario:
             print(f"Error processing profile {profile_name}: {e}")
             return []
 
+    def build_instance(self, optimizer=None):
+        """
+        Builds the Pyomo model instance of the scenario.
+
+        Parameters:
+        ----------
+        optimizer : pyomo.environ.AbstractModel, optional
+            The abstract model to instantiate (default is the cached model with fixed capacities).
+
+        Returns:
+        -------
+        pyomo.environ.ConcreteModel
+            The model instance, ready to be solved.
+        """
+        with tracing.span("scenario.model_input"):
+            m = model_input.OptNetworkInput()
+            m.populate_from_scenario_list(self.nodes, self.timesteps)
+
+        with tracing.span("scenario.abstract_model"):
+            if optimizer is None:
+                optimizer = opt.get_cached_abstract_pyomo_model(
+                    fix_capacities=True
+                )  # true to use slider values
+        if USE_DAT_FILE:
+            with tracing.span("scenario.write_dat"):
+                temp_file_path = m.save_to_temp_file() #saves file temporarily for multiple users
+                #m.write("test.dat")  # save file to folder
+            with tracing.span("scenario.create_instance"):
+                return opt.load_input_from_temp_file(optimizer, temp_file_path)
+        with tracing.span("scenario.create_instance"):
+            return opt.load_input_from_data(optimizer, m.to_pyomo_data())
+
     def optimize(self):
         """
         Optimizes the scenario using the model input and solver.
         """
-        m = model_input.OptNetworkInput()
-        m.populate_from_scenario_list(self.nodes, self.timesteps)
-        temp_file_path = m.save_to_temp_file() #saves file temporarily for multiple users
-        #m.write("test.dat")  # save file to folder
-
-        optimizer = opt.get_abstract_pyomo_model(
-            fix_capacities=True
-        )  # true to use slider values
-        #instance = opt.load_input(optimizer)
-        instance = opt.load_input_from_temp_file(optimizer, temp_file_path)
-        instance = opt.solve_instance(instance)
-        self.final_instance = ScenarioResults(instance)
+        instance = self.build_instance()
+        with tracing.span("scenario.solve"):
+            stats = opt.solve_instance(instance, opt.get_solver(self.solver_name))
+        self.final_instance = ScenarioResults(instance, stats)
+
+    def resolve(self, prodCapacities):
+        """
+        Optimizes the scenario for the given slider values, reusing the model instance of the previous call.
+
+        Only the installed capacities differ between the cells of a sweep, so the instance is built once and
+        the mutable installed_capacity parameter is updated in place before solving again.
+        The results of the previous call are detached from the instance first, so they stay valid.
+
+        Parameters:
+        ----------
+        prodCapacities : list
+            List of [nodeID, slider value] pairs.
+        """
+        if self.final_instance is not None:
+            self.final_instance.detach()
+
+        self.graph_data["sliderData"]["prodCapacities"] = prodCapacities
+        self.get_slider_data()
+
+        for node in self.nodes:
+            if isinstance(node, (Producer, Battery)):
+                node.installed_capacity = self.installed_capacity_adjuster(node.technology, node.node_id)
+                if self.instance is not None:
+                    self.instance.installed_capacity[node.technology, node.node_id] = node.installed_capacity
+
+        if self.instance is None:
+            self.instance = self.build_instance()
+            self.solver = opt.get_solver(self.solver_name)
+
+        with tracing.span("scenario.solve"):
+            stats = opt.solve_instance(self.instance, self.solver)
+        self.final_instance = ScenarioResults(self.instance, stats)
 
     def get_final_instance(self):
         """
@@ -0,0 +1,251 @@
+"""
+This file contains the registry of solver backends and the statistics of a solve.
+
+glpk runs as a subprocess: every solve writes an LP file, launches glpsol and parses the
+solution file back. highs runs HiGHS in-process through highspy and the Pyomo APPSI interface,
+without any file I/O or process spawn.
+
+    solver = solvers.get_solver("highs")
+    stats = solvers.solve(instance, solver)
+
+A warm-start backend keeps its model and basis between the solves of one solver object, so a
+re-solve after a small change of the instance (one slider step) starts from the previous basis.
+"""
+
+import logging, os, re, tempfile, time
+import pyomo.environ as pyo
+from pyomo.opt.solver import SystemCallSolver
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOLVER = "glpk"
+WARM_START_SOLVER = "highs"  # used by warm-started sweeps if the selected backend cannot warm-start
+
+_registry = {}  # name -> (factory, description, warm_start)
+
+
+def register_solver(name, factory, description="", warm_start=False):
+    """
+    Registers a solver backend.
+
+    Args:
+        name (str): Name of the backend, as selected by setting or request.
+        factory (callable): Returns a new Pyomo solver object.
+        description (str): Short description of the backend.
+        warm_start (bool): Whether re-solving with the same solver object starts from the previous basis.
+    """
+    _registry[name] = (factory, description, warm_start)
+
+
+def list_solvers():
+    """Returns the names of the registered solver backends."""
+    return list(_registry)
+
+
+def is_available(name):
+    """Returns whether the solver backend is registered and can be used in this environment."""
+    if name not in _registry:
+        return False
+    try:
+        return bool(_registry[name][0]().available(exception_flag=False))
+    except Exception:
+        return False
+
+
+def supports_warm_start(name):
+    """Returns whether the solver backend warm-starts a re-solve from the previous basis."""
+    return name in _registry and _registry[name][2]
+
+
+def get_solver(name=None):
+    """
+    Returns a new solver object of a registered backend.
+
+    Args:
+        name (str): Name of the backend (default is DEFAULT_SOLVER).
+
+    Returns:
+        The Pyomo solver object.
+
+    Raises:
+        ValueError: If no backend with this name is registered.
+    """
+    name = name or DEFAULT_SOLVER
+    if name not in _registry:
+        raise ValueError(f"Invalid solver: {name}. Must be one of {list_solvers()}.")
+    solver = _registry[name][0]()
+    solver.backend_name = name  # reported in the statistics of solve()
+    return solver
+
+
+class SolveStats:
+    """
+    A class to represent the statistics of a solve.
+
+    Attributes:
+    ----------
+    solver : str
+        Name of the solver backend.
+    termination_condition : str
+        Termination condition reported by the solver, e.g. "optimal" or "infeasible".
+    status : str
+        Solver status, e.g. "ok" or "warning".
+    objective : float
+        Value of the objective, None if the solve was not optimal.
+    wall_time_s : float
+        Wall time of the solve, including writing and reading files.
+    iterations : int
+        Simplex iterations, None if the backend does not report them.
+    rows : int
+        Number of constraints of the LP sent to the solver.
+    cols : int
+        Number of variables of the LP sent to the solver.
+    nonzeros : int
+        Number of nonzero coefficients of the LP sent to the solver.
+    log : str
+        The solver log, if it was captured.
+    """
+
+    def __init__(self, solver, termination_condition, status, objective=None, wall_time_s=None,
+                 iterations=None, rows=None, cols=None, nonzeros=None, log=None):
+        self.solver = solver
+        self.termination_condition = termination_condition
+        self.status = status
+        self.objective = objective
+        self.wall_time_s = wall_time_s
+        self.iterations = iterations
+        self.rows = rows
+        self.cols = cols
+        self.nonzeros = nonzeros
+        self.log = log
+
+    @property
+    def is_optimal(self):
+        return self.termination_condition == "optimal"
+
+    def to_dict(self, include_log=False):
+        """Returns the statistics as dict, without the log unless include_log is set."""
+        data = {
+            "solver": self.solver,
+            "terminationCondition": self.termination_condition,
+            "status": self.status,
+            "objective": self.objective,
+            "wallTime": self.wall_time_s,
+            "iterations": self.iterations,
+            "rows": self.rows,
+            "cols": self.cols,
+            "nonzeros": self.nonzeros,
+        }
+        if include_log:
+            data["log"] = self.log
+        return data
+
+    def __repr__(self):
+        return (
+            f"SolveStats({self.solver}: {self.termination_condition}, objective={self.objective}, "
+            f"{self.wall_time_s:.4f} s, {self.iterations} iterations, "
+            f"{self.rows} rows, {self.cols} cols, {self.nonzeros} nonzeros)"
+        )
+
+
+# glpsol log, e.g. "5164 rows, 6284 columns, 15524 non-zeros" and "*    57: obj =   1.8e+06 inf =   0.0e+00 (0)"
+_GLPK_SIZE = re.compile(r"^(\d+) rows?, (\d+) columns?, (\d+) non-zeros?", re.MULTILINE)
+_GLPK_ITERATION = re.compile(r"^[ *]*(\d+): obj =", re.MULTILINE)
+
+
+def _parse_log(log):
+    """Returns the model size and the simplex iterations found in a glpsol log."""
+    rows = cols = nonzeros = iterations = None
+    size = _GLPK_SIZE.search(log)
+    if size:
+        rows, cols, nonzeros = (int(x) for x in size.groups())
+    steps = _GLPK_ITERATION.findall(log)
+    if steps:
+        iterations = int(steps[-1])
+    return rows, cols, nonzeros, iterations
+
+
+def _problem_size(results):
+    """Returns the model size reported in the results of a solve, None where not reported."""
+    size = []
+    for key in ("number_of_constraints", "number_of_variables", "number_of_nonzeros"):
+        value = getattr(results.problem, key, None)
+        size.append(value if isinstance(value, int) and value > 0 else None)
+    return size
+
+
+def solve(model_instance, solver=None, tee=False):
+    """
+    Solves the model instance in place and returns the statistics of the solve.
+    A solve which is not optimal is logged as warning.
+
+    Args:
+        model_instance: The Pyomo model instance
+        solver: Solver of get_solver() to use (default is a new solver of the default backend)
+        tee (bool): Whether to stream the solver output to the console (default is False)
+
+    Returns:
+        SolveStats: The statistics of the solve.
+    """
+    if solver is None:
+        solver = get_solver()
+    name = getattr(solver, "backend_name", None) or str(getattr(solver, "name", type(solver).__name__))
+
+    # Subprocess solvers (glpsol) write their log to a file, which is read back for the statistics
+    log_path = None
+    kwargs = {"tee": tee}
+    if isinstance(solver, SystemCallSolver):
+        fd, log_path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        kwargs["logfile"] = log_path
+
+    start = time.perf_counter()
+    try:
+        results = solver.solve(model_instance, **kwargs)
+        wall_time_s = time.perf_counter() - start
+        log = None
+        if log_path is not None:
+            with open(log_path, "r") as f:
+                log = f.read()
+    finally:
+        if log_path is not None:
+            os.remove(log_path)
+
+    rows, cols, nonzeros = _problem_size(results)
+    iterations = None
+    highs = getattr(solver, "_solver_model", None)  # the highspy model of the APPSI interface
+    if highs is not None and hasattr(highs, "getInfo"):
+        rows, cols, nonzeros = highs.getNumRow(), highs.getNumCol(), highs.getNumNz()
+        iterations = highs.getInfo().simplex_iteration_count
+    elif log:
+        log_rows, log_cols, log_nonzeros, iterations = _parse_log(log)
+        rows, cols, nonzeros = log_rows or rows, log_cols or cols, log_nonzeros or nonzeros
+
+    stats = SolveStats(
+        solver=name,
+        termination_condition=str(results.solver.termination_condition),
+        status=str(results.solver.status),
+        wall_time_s=wall_time_s,
+        iterations=iterations,
+        rows=rows,
+        cols=cols,
+        nonzeros=nonzeros,
+        log=log,
+    )
+    if stats.is_optimal:
+        objective = next(model_instance.component_data_objects(pyo.Objective, active=True), None)
+        stats.objective = pyo.value(objective) if objective is not None else None
+    else:
+        logger.warning("Solve did not finish optimal: %s", stats)
+    logger.debug("%s", stats)
+    tracing.count("solver.solves")
+    if stats.iterations is not None:
+        tracing.count("solver.iterations", stats.iterations)
+    return stats
+
+
+register_solver("glpk", lambda: pyo.SolverFactory("glpk"), "GLPK, runs glpsol as subprocess")
+register_solver(
+    "highs", lambda: pyo.SolverFactory("appsi_highs"), "HiGHS in-process (highspy, Pyomo APPSI)", warm_start=True
+)
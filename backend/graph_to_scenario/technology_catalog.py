@@ -0,0 +1,125 @@
+"""
+This file contains the technology catalog, an in-process cache of Technology_defaults.xlsx.
+The workbook is parsed once per process and only reloaded when its modification time changes.
+"""
+
+import copy, os, threading
+import pandas as pd
+from pathlib import Path
+from . import Utils
+
+
+class TechnologyCatalog:
+    """
+    A class to serve the technology defaults and timestep files of an excel workbook from memory.
+
+    Attributes:
+    ----------
+    file_path : Path
+        The path to the excel file containing technology defaults.
+    mtime : float
+        Modification time of the workbook when it was last parsed, None if not loaded.
+    """
+
+    def __init__(self, file_path):
+        """
+        Constructs the catalog, the workbook is parsed on first access.
+
+        Parameters:
+        ----------
+        file_path : str or Path
+            The path to the excel file containing technology defaults.
+        """
+        self.file_path = Path(file_path)
+        self.mtime = None
+        self._defaults = {}
+        self._timesteps = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Parses both sheets of the workbook, if it changed since the last parse."""
+        try:
+            mtime = os.stat(self.file_path).st_mtime
+        except FileNotFoundError:
+            print(f"Error: File not found at {self.file_path}")
+            self.mtime, self._defaults, self._timesteps = None, {}, {}
+            return
+
+        if mtime == self.mtime:
+            return
+
+        try:
+            # Open the workbook once for both sheets
+            sheets = pd.read_excel(self.file_path, sheet_name=["Technology", "Timestep"])
+            for df in sheets.values():
+                df.columns = df.columns.str.strip().str.lower()
+
+            self._defaults = Utils.parse_technology_data(sheets["Technology"])
+            self._timesteps = Utils.parse_timestep_data(sheets["Timestep"])
+            self.mtime = mtime
+        except Exception as e:
+            print(f"Unexpected error loading Excel file: {e}")
+            self.mtime, self._defaults, self._timesteps = None, {}, {}
+
+    def get_defaults(self) -> dict:
+        """
+        Returns the technology defaults.
+
+        Returns:
+            dict: A copy of the dictionary where the key is the technology type and the value is its defaults.
+        """
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._defaults)
+
+    def get_profile_names(self) -> list:
+        """
+        Returns the availability and demand profiles referenced by the technology defaults.
+
+        Returns:
+            list: The names of the profile files, in the order of the technologies.
+        """
+        with self._lock:
+            self._load()
+            names = []
+            for defaults in self._defaults.values():
+                for key in ("availability_profile_name", "demand_profile_name"):
+                    name = defaults.get(key)
+                    if isinstance(name, str) and name and name not in names:
+                        names.append(name)
+            return names
+
+    def get_timestep(self, scenario_name: str = "default") -> str:
+        """
+        Returns the timestep file for a specific scenario name.
+
+        Args:
+            scenario_name (str): The name of the scenario to fetch the timestep for (default is "default").
+
+        Returns:
+            str: The timestep file for the given scenario name. Returns None if not found.
+        """
+        with self._lock:
+            self._load()
+            return self._timesteps.get(scenario_name.lower(), None)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(file_path) -> TechnologyCatalog:
+    """
+    Returns the catalog of the given workbook, shared by all scenarios of the process.
+
+    Args:
+        file_path (str or Path): The path to the excel file containing technology defaults.
+
+    Returns:
+        TechnologyCatalog: The catalog of the workbook.
+    """
+    key = str(Path(file_path).resolve())
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = TechnologyCatalog(key)
+        return _catalogs[key]
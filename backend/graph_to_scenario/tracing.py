@@ -0,0 +1,134 @@
+"""
+This file contains a lightweight span/timer API for the solve pipeline.
+
+A Trace collects the wall time of named spans, aggregated by name (count, total and maximum),
+for one request or one sweep. Code marks its stages with span(name); the time is added to the
+trace that is active in the current context, and nothing is recorded if no trace is active.
+Counters (e.g. the simplex iterations of all solves) are summed the same way with count(name, value).
+
+    with tracing.Trace("save_slider_data").activate() as trace:
+        with tracing.span("scenario.solve"):
+            ...
+    trace.log()
+"""
+
+import contextvars, logging, time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """
+    A class to aggregate the spans of a request or sweep.
+
+    Attributes:
+    ----------
+    name : str
+        Name of the traced request or sweep.
+    spans : dict
+        Span name -> {"count", "total_s", "max_s"}, in the order the spans were first finished.
+    counters : dict
+        Counter name -> sum of the counted values.
+    parent : Trace
+        The spans are added to the parent trace too, e.g. the request of a sweep.
+    """
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.spans = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+
+    def add(self, name, seconds, count=1, max_seconds=None):
+        """Adds count runs of a span which took seconds in total."""
+        entry = self.spans.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        entry["count"] += count
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds if max_seconds is None else max_seconds)
+        if self.parent is not None:
+            self.parent.add(name, seconds, count, max_seconds)
+
+    def count(self, name, value=1):
+        """Adds value to the counter name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.parent is not None:
+            self.parent.count(name, value)
+
+    def merge(self, spans, counters=None):
+        """Adds the spans and counters of another trace, e.g. of a sweep worker process."""
+        for name, entry in spans.items():
+            self.add(name, entry["total_s"], entry["count"], entry["max_s"])
+        for name, value in (counters or {}).items():
+            self.count(name, value)
+
+    @contextmanager
+    def activate(self):
+        """Makes this the trace of the current context for the duration of the block."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def to_dict(self):
+        """Returns the wall time of the trace, its spans and its counters."""
+        return {
+            "name": self.name,
+            "wall_s": time.perf_counter() - self.start,
+            "spans": self.spans,
+            "counters": self.counters,
+        }
+
+    def server_timing(self):
+        """Returns the spans as value of a Server-Timing response header."""
+        return ", ".join(
+            f'{name.replace(".", "-")};dur={entry["total_s"] * 1000:.1f};desc="{entry["count"]}x"'
+            for name, entry in self.spans.items()
+        )
+
+    def log(self, level=logging.DEBUG):
+        """Logs the spans of the trace, slowest first. The level is a logging level or its name."""
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        if not logger.isEnabledFor(level):
+            return
+        spans = sorted(self.spans.items(), key=lambda item: item[1]["total_s"], reverse=True)
+        lines = [
+            f"  {name}: {entry['total_s']:.4f} s total, {entry['count']} x, {entry['max_s']:.4f} s max"
+            for name, entry in spans
+        ]
+        lines += [f"  {name}: {value}" for name, value in self.counters.items()]
+        logger.log(
+            level,
+            "%s took %.4f s\n%s", self.name, time.perf_counter() - self.start, "\n".join(lines),
+        )
+
+
+def get_current_trace():
+    """Returns the trace of the current context, or None."""
+    return _current.get()
+
+
+def count(name, value=1):
+    """Adds value to the counter name of the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, value)
+
+
+@contextmanager
+def span(name):
+    """Adds the wall time of the block to the span name of the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def get_setting(name, default=None):
+    """
+    Returns a value from the Django settings, or the given default.
+
+    The optimizer can also be driven outside of a configured Django project
+    (e.g. from a script), in which case the default is returned.
+
+    Args:
+        name (str): The name of the setting.
+        default: The value returned if the setting is missing or Django is not configured.
+
+    Returns:
+        The value of the setting.
+    """
+    try:
+        return getattr(settings, name, default)
+    except ImproperlyConfigured:
+        return default
@@ -0,0 +1,145 @@
+"""
+This file contains the downsampling of long chart time series.
+A chart a few hundred pixels wide cannot show a full year of timesteps, so the series of a
+cell can be reduced to about maxPoints points per series while keeping their shape:
+Largest-Triangle-Three-Buckets (LTTB) for the storage levels of the line chart and
+min/max bucketing for the stacked bar chart.
+"""
+
+import numpy as np
+
+MIN_POINTS = 3  # LTTB keeps the first and the last point and needs at least one bucket
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Returns the indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and the last point are kept, the others are split into max_points - 2 buckets
+    and from every bucket the point forming the largest triangle with the point kept from
+    the previous bucket and the average of the next bucket is kept.
+
+    Args:
+        x (np.ndarray): The x values, sorted.
+        y (np.ndarray): The y values.
+        max_points (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: The sorted indices of the kept points.
+    """
+    n = len(x)
+    if max_points >= n or max_points < MIN_POINTS:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)  # bucket bounds, without first/last point
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket, the last point for the last bucket
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+    return indices
+
+
+def minmax_bucket_indices(positive, negative, max_points):
+    """
+    Returns the indices of the timesteps kept by min/max bucketing of a stacked bar chart.
+
+    The timesteps are split into max_points // 2 buckets, and from every bucket the timestep
+    with the highest positive stack and the one with the lowest negative stack are kept.
+    All series of the stack are reduced to the same timesteps, so the stacks stay aligned.
+
+    Args:
+        positive (np.ndarray): Height of the positive stack per timestep.
+        negative (np.ndarray): Height of the negative stack per timestep.
+        max_points (int): Maximum number of timesteps to keep.
+
+    Returns:
+        np.ndarray: The sorted indices of the kept timesteps.
+    """
+    n = len(positive)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, max_points // 2 + 1).astype(np.int64)
+    starts = edges[:-1]
+    kept = np.concatenate(
+        [
+            starts + np.array([np.argmax(positive[s:e]) for s, e in zip(starts, edges[1:])]),
+            starts + np.array([np.argmin(negative[s:e]) for s, e in zip(starts, edges[1:])]),
+        ]
+    )
+    return np.unique(kept)
+
+
+def downsample_line(records, max_points):
+    """
+    Returns the records of a line chart series reduced to at most max_points per unit with LTTB.
+
+    Args:
+        records (list): Line chart records of one node, e.g. {'H': 'Battery', 'N': 'node_3', 'T': 1, 'Value': 0.0}.
+        max_points (int): Maximum number of points per unit.
+
+    Returns:
+        list: The kept records, in their original order.
+    """
+    if len(records) <= max_points:
+        return records
+
+    rowsByUnit = {}
+    for position, record in enumerate(records):
+        rowsByUnit.setdefault(record.get("H"), []).append(position)
+
+    kept = []
+    for positions in rowsByUnit.values():
+        x = np.array([records[p]["T"] for p in positions], dtype=np.float64)
+        y = np.array([records[p]["Value"] if records[p]["Value"] is not None else np.nan for p in positions])
+        y = np.nan_to_num(y)
+        kept.extend(positions[i] for i in lttb_indices(x, y, max_points))
+    return [records[p] for p in sorted(kept)]
+
+
+def downsample_bars(recordsByOrder, max_points):
+    """
+    Returns the stacked bar chart series of a node reduced to at most max_points timesteps.
+
+    Args:
+        recordsByOrder (dict): Stack order -> bar chart records of one node, as in barChartData[node].
+        max_points (int): Maximum number of timesteps.
+
+    Returns:
+        dict: Stack order -> kept records, all orders are reduced to the same timesteps.
+    """
+    timesteps = np.unique(
+        [record["T"] for records in recordsByOrder.values() for record in records]
+    )
+    if len(timesteps) <= max_points:
+        return recordsByOrder
+
+    # Height of the positive (supply) and negative (demand) stack per timestep
+    positive = np.zeros(len(timesteps))
+    negative = np.zeros(len(timesteps))
+    for order, records in recordsByOrder.items():
+        stack = positive if order > 0 else negative
+        positions = np.searchsorted(timesteps, [record["T"] for record in records])
+        values = [record["Value"] if record["Value"] is not None else 0.0 for record in records]
+        np.add.at(stack, positions, values)
+
+    keptTimesteps = set(timesteps[minmax_bucket_indices(positive, negative, max_points)].tolist())
+    return {
+        order: [record for record in records if record["T"] in keptTimesteps]
+        for order, records in recordsByOrder.items()
+    }
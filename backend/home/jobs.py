@@ -0,0 +1,182 @@
+"""
+This file contains the job subsystem for asynchronous solves.
+A job runs OptimizerResultProcessor.process_response in a local worker thread, the sweep
+cells themselves are still solved by the process pool of the sweep engine.
+Jobs are kept in memory, so the status endpoint must be served by the same process.
+"""
+
+import threading, time, uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from graph_to_scenario import tracing
+from home.conf import get_setting
+from home.response_processing_new import OptimizerResultProcessor
+from home.sweep_engine import SweepCancelled
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    """
+    A class to represent an asynchronous solve.
+
+    Attributes:
+    ----------
+    id : str
+        Unique identifier of the job.
+    client_id : str
+        Identifier of the client, a new job of the same client cancels this one.
+    status : str
+        One of queued, running, done, failed or cancelled.
+    done : int
+        Number of solved cells.
+    total : int
+        Number of cells to solve, None until the job started.
+    result : dict
+        The result of process_response, once the job is done.
+    error : str
+        The error message, if the job failed.
+    timings : dict
+        The timings of the stages of the job, once it is finished.
+    """
+
+    def __init__(self, json_data, client_id=None):
+        self.id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.json_data = json_data
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.timings = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def is_finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def update_progress(self, done, total):
+        self.done, self.total = done, total
+
+    def to_dict(self, include_result=True, include_timings=False):
+        """Returns the status of the job, and its result (and timings) once it is done."""
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "progress": f"{self.done}/{self.total if self.total is not None else '?'} cells done",
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        if include_timings and self.timings is not None:
+            data["timings"] = self.timings
+        return data
+
+
+class JobManager:
+    """
+    A class to run solve jobs in a local worker pool and keep track of them.
+
+    Attributes:
+    ----------
+    max_workers : int
+        Number of jobs running at the same time.
+    max_finished : int
+        Number of finished jobs kept for polling, the oldest are forgotten first.
+    """
+
+    def __init__(self, max_workers=4, max_finished=100):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solve-job")
+
+    def submit(self, json_data, client_id=None):
+        """
+        Queues a solve and returns its job right away.
+        A running job of the same client is cancelled, as its sliders have moved on.
+        """
+        job = Job(json_data, client_id)
+        with self._lock:
+            if client_id is not None:
+                for other in self._jobs.values():
+                    if other.client_id == client_id and not other.is_finished:
+                        self._cancel(other)
+            self._jobs[job.id] = job
+            self._forget_finished()
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with the given id, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancels the remaining cells of a job. Returns the job, or None if it does not exist."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._cancel(job)
+            return job
+
+    def _cancel(self, job):
+        if job.is_finished:
+            return
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # The job never started
+            job.status, job.finished = CANCELLED, time.time()
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status = RUNNING
+        trace = tracing.Trace(f"solve job {job.id}")
+        try:
+            with trace.activate():
+                processor = OptimizerResultProcessor(
+                    job.json_data, cancel_event=job.cancel_event, progress=job.update_progress
+                )
+                job.result = processor.process_response()
+            job.status = DONE
+        except SweepCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.json_data = None  # the request data is not needed anymore
+            job.finished = time.time()
+            job.timings = trace.to_dict()
+            trace.log(get_setting("TRACE_LOG_LEVEL", "DEBUG"))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Returns the job manager of the process, configured by the JOB_* settings."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                max_workers=get_setting("JOB_MAX_WORKERS", 4),
+                max_finished=get_setting("JOB_MAX_FINISHED", 100),
+            )
+        return _manager
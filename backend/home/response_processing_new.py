@@ -1,13 +1,32 @@
-import json, math, random, os, copy
-from graph_to_scenario.scenario import Scenario
+import json, math, os
+from graph_to_scenario.scenario import MAX_SLIDER_VALUE, Scenario
+from graph_to_scenario import solvers, tracing
+from home.conf import get_setting
+from home.sweep_engine import GRID_SIZE, SweepEngine, is_feasible, slider_value
+from home import downsampling, result_cache, result_serializer
 
 
 class OptimizerResultProcessor:
-    def __init__(self, json_data):
+    def __init__(self, json_data, max_workers=None, cancel_event=None, progress=None, reuse_model=False, use_cache=True):
         self.json_data = json_data
+        self.reuse_model = reuse_model  # re-solve one model instance for all cells instead of building one per cell
+        self.use_cache = use_cache  # look up and store results in the result cache, off in sweep workers
+        self.scenario = None  # the reused scenario, if reuse_model is set
+        self.max_workers = max_workers  # sweep worker processes, None uses SWEEP_MAX_WORKERS
+        self.cancel_event = cancel_event  # threading.Event, stops the remaining cells of a sweep
+        self.progress = progress  # callable(done, total), called after every solved cell
         self.prodCapacities = []
         self.autoSimulate = None
         self.reset = None
+        self.maxPoints = None  # downsample the chart series to this many points, None sends every timestep
+        self.solver = None  # solver backend, from the slider data or the OPTIMIZER_SOLVER setting
+        self.pruneInfeasible = False  # skip the sweep cells proven infeasible, from the slider data or the SWEEP_PRUNE_INFEASIBLE setting
+        self.prunedCells = 0  # number of sweep cells returned as infeasible without solving them
+        self.resolution = [GRID_SIZE, GRID_SIZE]  # slider positions [cols, rows] of the sweep grid
+        self.adaptive = False  # refine a coarse grid instead of solving every cell of the sweep
+        self.solvedCells = 0  # number of cells of the last sweep which are not None
+        self.optimizeCapacities = False  # solve once with the capacities of the selected producers free instead of sweeping
+        self.optimum = []  # [nodeID, slider value] pairs of the optimized capacities, not rounded to the grid
         self.node_data = None
         self.bestIdx = []
         self.sliderVals = []
@@ -15,10 +34,8 @@ class OptimizerResultProcessor:
             None  # final JSON containing heatmap, linechart, and barchart data
         )
 
-    def process_response(self):
-        """Process the incoming JSON data and save it for debugging."""
-
-        # Extracting data from the JSON
+    def read_slider_data(self):
+        """Extracts the node and slider data from the incoming JSON."""
         self.node_data = self.json_data.get("nodes")
         slider_data = self.json_data.get("sliderData")
 
@@ -29,13 +46,65 @@ class OptimizerResultProcessor:
         self.autoSimulate = slider_data.get("autoSimulate")
         self.reset = slider_data.get("reset")
 
+        maxPoints = slider_data.get("maxPoints")
+        if maxPoints is not None:
+            if isinstance(maxPoints, bool) or not isinstance(maxPoints, int) or maxPoints < downsampling.MIN_POINTS:
+                raise ValueError(f"Invalid maxPoints: {maxPoints}. Must be an integer of at least {downsampling.MIN_POINTS}.")
+        self.maxPoints = maxPoints
+
+        self.solver = slider_data.get("solver") or get_setting("OPTIMIZER_SOLVER", solvers.DEFAULT_SOLVER)
+        if self.solver not in solvers.list_solvers():
+            raise ValueError(f"Invalid solver: {self.solver}. Must be one of {solvers.list_solvers()}.")
+
+        pruneInfeasible = slider_data.get("pruneInfeasible")
+        if pruneInfeasible is None:
+            pruneInfeasible = get_setting("SWEEP_PRUNE_INFEASIBLE", False)
+        if not isinstance(pruneInfeasible, bool):
+            raise ValueError(f"Invalid pruneInfeasible: {pruneInfeasible}. Must be true or false.")
+        self.pruneInfeasible = pruneInfeasible
+
+        resolution = slider_data.get("resolution", [GRID_SIZE, GRID_SIZE])
+        if (
+            not isinstance(resolution, list)
+            or len(resolution) != 2
+            or any(isinstance(n, bool) or not isinstance(n, int) or n < 2 for n in resolution)
+        ):
+            raise ValueError(f"Invalid resolution: {resolution}. Must be [cols, rows] with at least 2 positions each.")
+        self.resolution = resolution
+
+        adaptive = slider_data.get("adaptive", False)
+        if not isinstance(adaptive, bool):
+            raise ValueError(f"Invalid adaptive: {adaptive}. Must be true or false.")
+        self.adaptive = adaptive
+
+        optimizeCapacities = slider_data.get("optimizeCapacities", False)
+        if not isinstance(optimizeCapacities, bool):
+            raise ValueError(f"Invalid optimizeCapacities: {optimizeCapacities}. Must be true or false.")
+        self.optimizeCapacities = optimizeCapacities
+
+    def process_response(self):
+        """Process the incoming JSON data and save it for debugging."""
+
+        # Extracting data from the JSON
+        self.read_slider_data()
+
         # Check for reset state
         if not self.reset:
-            if self.autoSimulate:
+            if self.optimizeCapacities:
+                data = {
+                    "mainData": self.optimize_capacities(self.prodCapacities),
+                    "bestIdx": self.bestIdx,
+                    "optimum": self.optimum,
+                }
+            elif self.autoSimulate:
                 mainData = self.fillMatrixOfCells(
                     self.prodCapacities,
                 )
                 data = {"mainData": mainData, "bestIdx": self.bestIdx}
+                if self.pruneInfeasible:
+                    data["prunedCells"] = self.prunedCells
+                if self.adaptive:
+                    data["solvedCells"] = self.solvedCells
             else:
                 data = {
                     "mainData": self.fill_cell(
@@ -43,6 +112,8 @@ class OptimizerResultProcessor:
                     ),
                     "bestIdx": self.bestIdx,
                 }
+                if self.progress is not None:
+                    self.progress(1, 1)
         else:
             data = {
                 "mainData": None,
@@ -50,7 +121,45 @@ class OptimizerResultProcessor:
             }
 
         return data
-    
+
+    def stream_response(self):
+        """
+        Same as process_response, but yields (event, data) tuples as soon as they are available:
+        a "cell" event for every solved cell ({"col", "row", "mainData"}; col and row only
+        when auto-simulating) and a final "done" event with bestIdx (and optimum when optimizing capacities).
+        """
+        self.read_slider_data()
+
+        if self.reset:
+            yield "done", {"mainData": None, "bestIdx": self.bestIdx}
+            return
+
+        if self.optimizeCapacities:
+            yield "cell", {"mainData": self.optimize_capacities(self.prodCapacities)}
+            yield "done", {"bestIdx": self.bestIdx, "optimum": self.optimum}
+            return
+
+        if not self.autoSimulate:
+            yield "cell", {"mainData": self.fill_cell(self.prodCapacities)}
+            yield "done", {"bestIdx": self.bestIdx}
+            return
+
+        engine = self.get_sweep_engine()
+        resultMatrix = engine.empty_matrix()
+        capacitiesMatrix = engine.empty_matrix()
+        for col, row, capacities, value in engine.iter_cell_results(self.prodCapacities):
+            resultMatrix[col][row] = value
+            capacitiesMatrix[col][row] = capacities
+            yield "cell", {"col": col, "row": row, "mainData": value}
+
+        self.bestIdx[:] = engine.select_best(resultMatrix, capacitiesMatrix, self.prodCapacities)
+        done = {"bestIdx": self.bestIdx}
+        if self.pruneInfeasible:
+            done["prunedCells"] = engine.pruned
+        if self.adaptive:
+            done["solvedCells"] = sum(value is not None for values in resultMatrix for value in values)
+        yield "done", done
+
     def run_optimizer_return_results(self, prodCapacities):
         """
         Runs the optimizer and returns a combined JSON containing heatmap, linechart,
@@ -58,41 +167,112 @@ class OptimizerResultProcessor:
         """
         self.json_data["sliderData"]["prodCapacities"] = prodCapacities
 
-        optimizer = Scenario(self.json_data)
-        optimizer_result = optimizer.get_final_instance()
+        # Return the result of an identical scenario solved before
+        cache = result_cache.get_result_cache() if self.use_cache else None
+        if cache is not None:
+            with tracing.span("processor.cache_lookup"):
+                key = result_cache.make_key(self.json_data, prodCapacities, self.solver)
+                cached = cache.get(key)
+            if cached is not None:
+                self.combined_json = cached
+                return
+
+        if self.reuse_model:
+            if self.scenario is None:
+                self.scenario = Scenario(self.json_data, solve=False, solver_name=self.solver)
+            self.scenario.resolve(prodCapacities)
+            optimizer = self.scenario
+        else:
+            optimizer = Scenario(self.json_data, solver_name=self.solver)
+        self.set_combined_json(optimizer.get_final_instance())
 
-        # Heatmap (single float value)
-        heatmap_data = optimizer_result.get_heatmap_plot_data()  # single value
-        if heatmap_data == float("inf"):  # Handle float("inf") for JSON compatibility
-            heatmap_data = '"inf"'  #'"Inf"' #in case value is infinite return 9999, change this later to Inf and integrate in matrix to display string
-        ##########Important, change ^the above line later ^^##################
+        if cache is not None:
+            with tracing.span("processor.cache_store"):
+                cache.set(key, self.combined_json)
 
-        # Line chart (DataFrame to JSON)
-        linechart_data = (optimizer_result.get_storage_level_plot_data()).to_json(
-            orient="records"
-        )
+    def set_combined_json(self, optimizer_result):
+        """
+        Builds the combined data directly from the result frames, it is encoded once in the response.
+        The heatmap is float("inf") if not all demand is met, it is sent as "inf" by the serializer.
+        """
+        with tracing.span("processor.payload"):
+            self.combined_json = {
+                "heatmap": optimizer_result.get_heatmap_plot_data(),  # single value
+                "linechart": result_serializer.frame_to_records(
+                    optimizer_result.get_storage_level_plot_data()
+                ),
+                "barchart": result_serializer.frame_to_records(
+                    optimizer_result.get_generation_conusmption_plot_data()
+                ),
+            }  # Save the combined JSON for later use
+            optimizer_result.detach()  # release the solved instance, only the extracted values are kept
 
-        # Bar chart (DataFrame to JSON)
-        barchart_data = (
-            optimizer_result.get_generation_conusmption_plot_data()
-        ).to_json(orient="records")
-
-        # Create a combined JSON string with different keys
-        combined_json = f"""
-        {{
-            "heatmap": {heatmap_data},
-            "linechart": {linechart_data},
-            "barchart": {barchart_data}
-        }}
+    def optimize_capacities(self, prodCapacities):
         """
-        self.combined_json = json.loads(
-            combined_json
-        )  # Save the combined JSON for later use
+        Solves the scenario once with the capacities of the two selected producers free between 0 and the
+        capacity of the highest slider value, and all other sliders fixed, instead of sweeping the grid.
+
+        The optimal capacities are mapped back to slider values and kept in self.optimum. bestIdx is the
+        cheapest feasible cell of the grid positions around the optimum (the position below and above
+        it on both axes, at most 4 cells with fixed capacities), all sliders 0 if none of them is feasible,
+        like the sweep. The returned cell shows the optimum, its heatmap value is a lower bound of the
+        cheapest cell of the grid.
+        """
+        self.json_data["sliderData"]["prodCapacities"] = prodCapacities
+        freeIds = [slider["nodeID"] for slider in self.sliderVals[:2]]
+        scenario = Scenario(
+            self.json_data, solver_name=self.solver, free_capacities=[f"node_{nodeID}" for nodeID in freeIds]
+        )
+        optimizer_result = scenario.get_final_instance()
+
+        capacities = {n: (h, value) for h, n, value in optimizer_result["Cg"].itertuples(index=False)}
+        optimum = {}
+        for nodeID in freeIds:
+            if f"node_{nodeID}" not in capacities:
+                raise ValueError(f"Node {nodeID} is not a producer, only producer capacities can be optimized.")
+            technology, capacity = capacities[f"node_{nodeID}"]
+            optimum[nodeID] = min(max(scenario.capacity_to_slider_value(technology, capacity), 0), MAX_SLIDER_VALUE)
+        self.optimum = [[nodeID, optimum.get(nodeID, value)] for nodeID, value in prodCapacities]
+
+        self.set_combined_json(optimizer_result)
+        with tracing.span("processor.charts"):
+            cell = self.build_cell()
+
+        # Grid values below and above the optimum (resolution is [cols, rows] of the two selected sliders),
+        # a position closer than 1e-6 to the optimum is taken as it is
+        gridValues = []
+        for nodeID, positions in zip(freeIds, self.resolution):
+            position = optimum[nodeID] * (positions - 1) / MAX_SLIDER_VALUE
+            below, above = math.floor(position + 1e-6), math.ceil(position - 1e-6)
+            gridValues.append(sorted({slider_value(below, positions), slider_value(above, positions)}))
+
+        # The corners are compared in matrix order, so ties resolve like the sweep
+        corners = [(colValue, rowValue) for colValue in gridValues[0] for rowValue in gridValues[1]]
+        if self.progress is not None:
+            self.progress(1, 1 + len(corners))
+        bestMatrixVal = float("inf")
+        self.bestIdx[:] = [[nodeID, 0] for nodeID, _ in prodCapacities]
+        for done, (colValue, rowValue) in enumerate(corners, 2):
+            gridCell = {freeIds[0]: colValue, freeIds[1]: rowValue}
+            cornerCapacities = [[nodeID, gridCell.get(nodeID, value)] for nodeID, value in prodCapacities]
+            value = self.fill_cell(cornerCapacities)["matrixData"]
+            if is_feasible(value) and bestMatrixVal > value:
+                bestMatrixVal = value
+                self.bestIdx[:] = cornerCapacities
+            if self.progress is not None:
+                self.progress(done, 1 + len(corners))
+        return cell
 
     def fill_cell(self, prodCapacities):
         """Fills a cell with calculated values and saves combined data."""
         self.run_optimizer_return_results(prodCapacities)
 
+        with tracing.span("processor.charts"):
+            return self.build_cell()
+
+    def build_cell(self):
+        """Builds the cell data of the frontend from the combined data of the last solve."""
+
         # Extract DataFrames from the optimizer output
         matrixData = JSONExtractor.extract_items(self.combined_json, "heatmap")
 
@@ -103,31 +283,30 @@ class OptimizerResultProcessor:
         barChartData = {}
         timestep = max(barItem.get("T") for barItem in tmpBar)
 
+        # Group the rows by node id and stack order in a single pass over each list
+        barRowsByNode = {}
+        for bardata in tmpBar: # barData is something like this: {'H': 'Solar', 'N': 'node_1', 'T': 1, 'Value': 0.0, 'Order': 1, 'Type': 'Supply'}
+            rowsByOrder = barRowsByNode.setdefault(bardata["N"][5:], {})
+            rowsByOrder.setdefault(bardata["Order"], []).append({**bardata,  "Value": math.copysign(bardata["Value"], bardata["Order"])}) #create a dict with all Values being multiplied by either 1 or -1 depending on the sign of Order (Goal: For nodes with type Demand to have negative Value)
+
+        lineRowsByNode = {}
+        for linedata in tmpLine:
+            lineRowsByNode.setdefault(linedata["N"][5:], []).append(linedata)
+
         for node in self.node_data:
 
             if node.get("type") != "junction": #if the node is not a junction, then it produces data for the barchart and possibly linechart
                 currentNodeID = node.get("id")[5:]
 
-                for bardata in tmpBar: # barData is something like this: {'H': 'Solar', 'N': 'node_1', 'T': 1, 'Value': 0.0, 'Order': 1, 'Type': 'Supply'}
-                    currentBarDataID = bardata.get("N", -1)[5:]
-                    if currentBarDataID == currentNodeID:
-                        if barChartData.get(currentBarDataID) is None:
-                            barChartData.update({currentBarDataID:{}})
-                        currentOrder = bardata.get("Order")
-                        if barChartData.get(currentBarDataID).get(currentOrder) is None:
-                            barChartData.get(currentBarDataID).update({currentOrder:[]})
-                        barChartData.get(currentBarDataID).get(currentOrder).append({**bardata,  "Value": math.copysign(bardata["Value"], bardata["Order"])}) #create a dict with all Values being multiplied by either 1 or -1 depending on the sign of Order (Goal: For nodes with type Demand to have negative Value)
-    
+                if currentNodeID in barRowsByNode:
+                    barChartData[currentNodeID] = barRowsByNode[currentNodeID]
+                    if self.maxPoints is not None: # min/max bucketing, the stacks of the node keep the same timesteps
+                        barChartData[currentNodeID] = downsampling.downsample_bars(barChartData[currentNodeID], self.maxPoints)
+
                 if node.get("type") == "battery":#if node is a battery, then it additionally produces data for linechart
-                    lineChartData.update(## group all objects for linechart data together by node id
-                        {
-                            currentNodeID: [
-                                linedata
-                                for linedata in tmpLine
-                                if linedata.get("N", -1)[5:] == currentNodeID
-                            ]
-                        }
-                    )
+                    lineChartData[currentNodeID] = lineRowsByNode.get(currentNodeID, []) ## group all objects for linechart data together by node id
+                    if self.maxPoints is not None: # LTTB keeps the shape of the storage level
+                        lineChartData[currentNodeID] = downsampling.downsample_line(lineChartData[currentNodeID], self.maxPoints)
         return {
             "matrixData": matrixData,
             "chartsData": {
@@ -137,52 +316,25 @@ class OptimizerResultProcessor:
             },
         }
 
+    def get_sweep_engine(self):
+        """Returns the sweep engine for the auto-simulate matrix of this request."""
+        return SweepEngine(
+            self,
+            max_workers=self.max_workers,
+            cancel_event=self.cancel_event,
+            progress=self.progress,
+            prune=self.pruneInfeasible,
+            grid_size=tuple(self.resolution),
+            adaptive=self.adaptive,
+        )
+
     def fillMatrixOfCells(self, prodCapacities):
         """Fills the result matrix for all slider value combinations."""
-        bestMatrixVal = [float("inf")]
-        resultMatrix = [[0 for _ in range(6)] for _ in range(6)]
-        indexCol = -1
-        indexRow = -1
-
-        # Identify index of nodes in prodCapacities
-        if self.sliderVals[0]["nodeID"] in [entry[0] for entry in prodCapacities]:
-            indexCol = next(
-                (
-                    i
-                    for i, entry in enumerate(prodCapacities)
-                    if entry[0] == self.sliderVals[0]["nodeID"]
-                ),
-                -1,
-            )
-
-        if self.sliderVals[1]["nodeID"] in [entry[0] for entry in prodCapacities]:
-            indexRow = next(
-                (
-                    i
-                    for i, entry in enumerate(prodCapacities)
-                    if entry[0] == self.sliderVals[1]["nodeID"]
-                ),
-                -1,
-            )
-        
-
-        if indexCol == -1 or indexRow == -1:
-            raise Exception("IDs of selectedNodes are not in prodCapacities")
-
-        # Fill the result matrix
-        for col in range(6):
-            prodCapacities[indexCol][1] = col
-            for row in range(6):
-                prodCapacities[indexRow][1] = row
-                value = self.fill_cell(prodCapacities)
-                resultMatrix[col][row] = value
-
-                if not isinstance(value["matrixData"], str) and bestMatrixVal[0] > value["matrixData"]:
-                    bestMatrixVal[0] = value["matrixData"]
-                    self.bestIdx[:] = copy.deepcopy(prodCapacities)
-
-        if bestMatrixVal == [float("inf")]:
-            self.bestIdx[:] = [[x[0], 0] for x in prodCapacities]
+        engine = self.get_sweep_engine()
+        resultMatrix, bestIdx = engine.run(prodCapacities)
+        self.bestIdx[:] = bestIdx
+        self.prunedCells = engine.pruned
+        self.solvedCells = sum(value is not None for values in resultMatrix for value in values)
 
         return resultMatrix
 
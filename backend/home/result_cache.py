@@ -0,0 +1,245 @@
+"""
+This file contains the cache of solved scenarios.
+Results are keyed by a canonical hash of the graph, the slider state, the solver backend and the
+timestep scenario, kept in memory with LRU eviction and optionally persisted on disk to survive restarts.
+"""
+
+import hashlib, json, logging, os, pickle, tempfile, threading
+from collections import OrderedDict
+from pathlib import Path
+from graph_to_scenario import profile_store, technology_catalog
+from graph_to_scenario.scenario import EXCEL_FILE_PATH, VOLUME_DATA_FOLDER, get_timestep_file
+from home.conf import get_setting
+
+logger = logging.getLogger(__name__)
+
+DISK_PRUNE_FRACTION = 0.9  # a full disk tier is pruned to 90% of disk_max_entries, so pruning is rare
+
+
+def _mtime(path):
+    """Returns the modification time of a file, None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def make_key(json_data, prodCapacities, solver, timestep_scenario="default"):
+    """
+    Returns the canonical hash of a scenario. Node positions, edge handles and the order
+    of nodes, edges and sliders do not change the key.
+
+    Args:
+        json_data (dict): The scenario json from the frontend.
+        prodCapacities (list): The [nodeID, slider value] pairs of the cell.
+        solver (str): The solver backend which solves the cell. Degenerate LPs have several
+            optimal dispatches, so the charts of different backends can differ.
+        timestep_scenario (str): The timestep scenario of the workbook, unless the
+            slider data selects a timestepFile.
+
+    Returns:
+        str: The hex digest of the key.
+    """
+    graph = json_data.get("data", json_data)
+    profile_names = technology_catalog.get_catalog(EXCEL_FILE_PATH).get_profile_names()
+    timestep_file = get_timestep_file(json_data, timestep_scenario)
+    canonical = {
+        "nodes": sorted(
+            [str(n.get("id")), str(n.get("type")).lower(), str(n.get("label")).lower()]
+            for n in graph.get("nodes") or []
+        ),
+        "edges": sorted(
+            [str(e.get("source")), str(e.get("target"))] for e in graph.get("edges") or []
+        ),
+        "prodCapacities": sorted([str(i), float(v)] for i, v in prodCapacities),
+        "solver": solver,
+        "timestep": timestep_file,
+        # timestep and weights files rewritten (e.g. by the clustering tool) -> new results
+        "timestepMtime": [
+            _mtime(VOLUME_DATA_FOLDER / timestep_file),
+            _mtime(VOLUME_DATA_FOLDER / profile_store.get_weights_file_name(timestep_file)),
+        ],
+        # technology defaults or profiles changed -> new results
+        "catalog": _mtime(EXCEL_FILE_PATH),
+        "profiles": [[name, _mtime(VOLUME_DATA_FOLDER / name)] for name in profile_names],
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    A LRU cache of solved scenario results with an optional on-disk tier.
+
+    Values are stored pickled, so every get returns an independent copy.
+
+    Attributes:
+    ----------
+    max_entries : int
+        Maximum number of results kept in memory.
+    max_bytes : int
+        Maximum total size of the pickled results kept in memory.
+    cache_dir : Path
+        Folder of the on-disk tier, None to disable it.
+    disk_max_entries : int
+        Maximum number of results kept on disk. The files are counted once, on the first write,
+        and once the count exceeds the maximum the least recently used are removed.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=256 * 1024 * 1024, cache_dir=None, disk_max_entries=10000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> pickled value, least recently used first
+        self._bytes = 0
+        self._disk_entries = None  # number of results on disk, counted on the first write
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def _put_memory(self, key, blob):
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        if len(blob) > self.max_bytes:
+            return
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        # Evict the least recently used results
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            os.utime(path)  # mark as recently used
+            return blob
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Could not read cached result %s: %s", path, e)
+            return None
+
+    def _write_disk(self, key, blob):
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._disk_path(key)
+            new = not path.exists()
+            # Write to a temporary file first, other processes may read the cache at the same time
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+
+            if self._disk_entries is None:
+                self._disk_entries = sum(1 for _ in self.cache_dir.glob("*.pkl"))
+            elif new:
+                self._disk_entries += 1
+            if self._disk_entries > self.disk_max_entries:
+                self._prune_disk()
+        except OSError as e:
+            logger.warning("Could not write cached result to %s: %s", self.cache_dir, e)
+
+    def _prune_disk(self):
+        """Removes the least recently used results from disk, down to DISK_PRUNE_FRACTION of disk_max_entries."""
+        files = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:  # removed by another process
+                pass
+        files.sort()
+        keep = int(self.disk_max_entries * DISK_PRUNE_FRACTION)
+        for _, path in files[: max(len(files) - keep, 0)]:
+            path.unlink(missing_ok=True)
+        self._disk_entries = min(len(files), keep)
+
+    def get(self, key):
+        """
+        Returns a copy of the cached result, or None if the key is not cached.
+        """
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+            else:
+                blob = self._read_disk(key)
+                if blob is not None:
+                    self._put_memory(key, blob)
+
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(blob)
+
+    def set(self, key, value):
+        """
+        Stores a result in memory and, if enabled, on disk.
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._put_memory(key, blob)
+            self._write_disk(key, blob)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.cache_dir is not None and self._disk_path(key).exists()
+
+    def clear(self):
+        """Removes all results from memory (the on-disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_disabled = False
+
+
+def disable_result_cache():
+    """
+    Disables the result cache of the process, get_result_cache returns None from now on,
+    so that every request solves its cells (e.g. in benchmarks).
+    """
+    global _cache, _disabled
+    with _cache_lock:
+        _cache, _disabled = None, True
+
+
+def get_result_cache():
+    """
+    Returns the result cache of the process, configured by the RESULT_CACHE_* settings.
+    Returns None if RESULT_CACHE_MAX_ENTRIES is 0 or the cache was disabled.
+    """
+    global _cache
+    with _cache_lock:
+        if _disabled:
+            return None
+        if _cache is None:
+            max_entries = get_setting("RESULT_CACHE_MAX_ENTRIES", 512)
+            if not max_entries:
+                return None
+            _cache = ResultCache(
+                max_entries=max_entries,
+                max_bytes=get_setting("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+                cache_dir=get_setting("RESULT_CACHE_DIR", None),
+                disk_max_entries=get_setting("RESULT_CACHE_DISK_MAX_ENTRIES", 10000),
+            )
+        return _cache
@@ -0,0 +1,177 @@
+"""
+This file contains the serializer of the optimizer results.
+The chart records are built directly from the extracted columns of the result frames, and a
+response is encoded once, with orjson if it is installed and the json module otherwise.
+The records format is the default, the columnar formats send every chart series once as
+column arrays with a small schema header.
+
+Infinite heatmap values (unmet demand) stay float("inf") inside the backend and are only
+written as the string "inf" on the wire, which is what the frontend expects.
+"""
+
+import base64, json, math
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional, the json module is used instead
+    orjson = None
+
+INF = "inf"  # wire representation of an infeasible heatmap cell
+DOUBLE_PRECISION = 10  # decimals of the chart values, same as DataFrame.to_json
+
+FORMATS = ("records", "columnar", "columnar-base64")
+# Columns of the chart records and their types in the columnar formats
+COLUMNS = {"H": "string", "N": "string", "T": "int", "Value": "float", "Order": "int", "Type": "string"}
+# Numeric columns are sent as little-endian buffers in the "columnar-base64" format
+BUFFER_DTYPES = {"int": "<i4", "float": "<f4"}
+BUFFER_TYPES = {"int": "int32", "float": "float32"}
+
+
+def frame_to_records(df, double_precision=DOUBLE_PRECISION):
+    """
+    Returns the rows of a DataFrame as a list of dicts, like df.to_json(orient="records")
+    followed by json.loads, but without encoding and decoding the frame.
+
+    Args:
+        df (pd.DataFrame): The frame, the index is ignored.
+        double_precision (int): Number of decimals of float columns.
+
+    Returns:
+        list: One dict per row, NaN values are None.
+    """
+    columns = []
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if values.dtype.kind == "f":
+            values = np.round(values, double_precision)
+            if np.isnan(values).any():
+                values = np.where(np.isnan(values), None, values)
+        columns.append(values.tolist())
+
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def heatmap_value(value):
+    """Returns the heatmap value of a cell as JSON value, "inf" if all demand cannot be met."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return INF
+    return value
+
+
+def _to_wire(data, convert_charts=None):
+    """
+    Returns data with the infinite matrixData of all cells replaced by "inf", and the chartsData
+    of all cells converted by convert_charts if given.
+    Only the containers holding cells are copied (mainData, the matrix rows and job results),
+    the chart data is shared with the original.
+    """
+    if isinstance(data, list):
+        return [_to_wire(item, convert_charts) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    converted = None
+    for key in ("matrixData", "chartsData", "mainData", "result"):
+        if key in data:
+            value = data[key]
+            if key == "matrixData":
+                wire_value = heatmap_value(value)
+            elif key == "chartsData":
+                wire_value = convert_charts(value) if convert_charts is not None else value
+            else:
+                wire_value = _to_wire(value, convert_charts)
+            if wire_value is not value:
+                if converted is None:
+                    converted = dict(data)
+                converted[key] = wire_value
+    return converted if converted is not None else data
+
+
+def _columnar_series(records, base64_buffers):
+    """
+    Returns a list of chart records as one series: columns with the same value in every
+    record are sent once as constants, the others as arrays (or base64 buffers).
+    """
+    series = {"length": len(records), "constants": {}, "columns": {}}
+    if not records:
+        return series
+
+    for name, dtype in COLUMNS.items():
+        if name not in records[0]:  # e.g. the line chart has no Order and Type
+            continue
+        values = [record.get(name) for record in records]
+        if all(value == values[0] for value in values):
+            series["constants"][name] = values[0]
+        elif base64_buffers and dtype in BUFFER_DTYPES:
+            buffer = np.asarray(values, dtype=BUFFER_DTYPES[dtype]).tobytes()
+            series["columns"][name] = base64.b64encode(buffer).decode("ascii")
+        else:
+            series["columns"][name] = values
+    return series
+
+
+def _columnar_charts(chartsData, base64_buffers):
+    """Returns the chartsData of a cell with all record lists converted to series."""
+    return {
+        "lineChartData": {
+            node: _columnar_series(records, base64_buffers)
+            for node, records in chartsData["lineChartData"].items()
+        },
+        "barChartData": {
+            node: {
+                order: _columnar_series(records, base64_buffers)
+                for order, records in recordsByOrder.items()
+            }
+            for node, recordsByOrder in chartsData["barChartData"].items()
+        },
+        "timestep": chartsData["timestep"],
+    }
+
+
+def get_schema(format):
+    """
+    Returns the schema header of a columnar response: the type of every chart column and,
+    for "columnar-base64", how the numeric columns are encoded.
+    """
+    encoding = "base64" if format == "columnar-base64" else "json"
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        if encoding == "base64" and dtype in BUFFER_DTYPES:
+            columns[name] = BUFFER_TYPES[dtype]
+        else:
+            columns[name] = dtype
+    return {"format": "columnar", "version": 1, "encoding": encoding, "columns": columns}
+
+
+def dumps(data, format="records") -> bytes:
+    """
+    Encodes a response payload (a process_response result, a stream event or a job status) as JSON.
+
+    In the columnar formats every list of chart records becomes a series
+    {"length": n, "constants": {column: value}, "columns": {column: values}}, and a
+    "schema" header is added to the payload (which must be a dict).
+
+    Args:
+        data: The payload.
+        format (str): One of FORMATS, "records" sends every chart record as an object,
+            "columnar" sends the columns as arrays, "columnar-base64" sends the numeric
+            columns as base64-encoded little-endian Float32/Int32 buffers.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Invalid format: {format}. Must be one of {FORMATS}.")
+
+    if format == "records":
+        data = _to_wire(data)
+    else:
+        base64_buffers = format == "columnar-base64"
+        data = _to_wire(data, lambda charts: _columnar_charts(charts, base64_buffers))
+        data = {"schema": get_schema(format), **data}
+
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
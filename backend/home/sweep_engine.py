@@ -0,0 +1,538 @@
+"""
+This file contains the sweep engine for the auto-simulate heatmap.
+Every cell of the slider grid is an independent optimization, so the cells are
+distributed to a bounded process pool which is shared by all requests of the process.
+
+In "cells" mode every cell is a task of its own. In "persistent" mode the cells are split
+into one batch per worker, and each batch re-solves a single model instance with updated
+installed capacities instead of building an instance per cell.
+"warm" mode is "persistent" mode with the cells in serpentine order (every column of the
+matrix is traversed in the opposite direction of the previous one), so that consecutive cells
+differ by one slider step, solved by a warm-start backend which starts every re-solve from
+the basis of the previous cell.
+
+With pruning, the cells are solved from the highest to the lowest slider sum. Installed capacity
+never increases unmet demand, so every cell with both sliders at or below an infeasible cell is
+infeasible too and is not solved: it is returned as infeasible with empty charts. The mirrored case
+is not pruned: every cell with both sliders at or above a fully-met cell meets all demand too, but
+its heatmap value is the cost of supply, which changes with the installed capacities and still needs
+a solve. With a pool, every cell of a pruned sweep is a task of its own. In "persistent" and "warm"
+mode every worker keeps the model instance of the sweep between its tasks and re-solves it.
+
+The grid has GRID_SIZE x GRID_SIZE slider positions by default, or any cols x rows resolution:
+position i of n on an axis is the slider value i * MAX_SLIDER_VALUE / (n - 1). An adaptive sweep
+solves a coarse subgrid first and then refines only around the cheapest feasible cell and the
+boundary between feasible and infeasible cells, the other cells of the grid stay None.
+"""
+
+import copy, math, multiprocessing, os, threading, uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from graph_to_scenario import solvers, tracing
+from graph_to_scenario.scenario import MAX_SLIDER_VALUE
+from home.conf import get_setting
+from home import result_cache
+
+GRID_SIZE = 6  # number of slider positions per axis (0..5)
+SWEEP_MODES = ("cells", "persistent", "warm")
+ADAPTIVE_MIN_INTERVALS = 2  # the coarse subgrid of an adaptive sweep has at least 2 intervals per axis
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_processor = None  # (sweep id, processor) re-solved by the tasks of a pruned sweep in a pool worker
+
+
+def get_max_workers():
+    """Returns the configured number of sweep worker processes (SWEEP_MAX_WORKERS)."""
+    workers = get_setting("SWEEP_MAX_WORKERS", None) or os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def get_process_pool():
+    """
+    Returns the process pool shared by all sweeps, creating it on first use.
+    Workers are spawned (not forked) so that they are safe to start from a threaded server.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=get_max_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    """Shuts the shared pool down, a new one is created by the next sweep."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def is_feasible(matrixData):
+    """Returns whether the heatmap value of a cell is finite, i.e. all demand is met."""
+    # Infeasible cells are inf (or "inf" in results cached by older versions)
+    return isinstance(matrixData, (int, float)) and math.isfinite(matrixData)
+
+
+def slider_value(position, positions):
+    """Returns the slider value of a grid position, an int if it is a whole number (e.g. 0..5 on a 6 x 6 grid)."""
+    value = position * MAX_SLIDER_VALUE / (positions - 1)
+    return int(value) if value.is_integer() else value
+
+
+def axis_positions(positions, stride):
+    """Returns every stride-th position of an axis, and always the last one."""
+    return sorted(set(range(0, positions, stride)) | {positions - 1})
+
+
+def pruned_cell():
+    """
+    Returns a cell that is proven infeasible without solving it. Its charts have no nodes and
+    no timesteps, the frontend clears the charts when such a cell is selected.
+    """
+    return {"matrixData": float("inf"), "chartsData": {"lineChartData": {}, "barChartData": {}, "timestep": 0}}
+
+
+class SweepCancelled(Exception):
+    """Raised by the sweep engine when the sweep was cancelled before all cells were solved."""
+    pass
+
+
+def _get_cell_processor(json_data, reuse_model, solver=None, use_cache=True):
+    """
+    Returns a processor solving cells of the sweep, solver overrides the solver backend of the request.
+    Pool workers pass use_cache=False: the parent process caches the results they return.
+    """
+    from home.response_processing_new import OptimizerResultProcessor
+
+    processor = OptimizerResultProcessor(json_data, reuse_model=reuse_model, use_cache=use_cache)
+    processor.read_slider_data()
+    if solver is not None:
+        processor.solver = solver
+    return processor
+
+
+def _iter_solve_cells(json_data, capacities_list, reuse_model, solver=None, use_cache=True):
+    """
+    Solves the cells one after another and yields the same structure as
+    OptimizerResultProcessor.fill_cell and the solved results of every cell.
+    solver overrides the solver backend of the request, use_cache=False bypasses the result cache.
+    """
+    processor = _get_cell_processor(json_data, reuse_model, solver, use_cache)
+    for capacities in capacities_list:
+        yield processor.fill_cell(capacities), processor.combined_json
+
+
+def _get_worker_processor(json_data, sweep_id, solver=None):
+    """
+    Returns the processor of the sweep in this pool worker, it re-solves one model instance for all
+    tasks of the sweep which the worker runs. The processor of a previous sweep is released.
+    """
+    global _worker_processor
+    if _worker_processor is None or _worker_processor[0] != sweep_id:
+        _worker_processor = None
+        _worker_processor = (sweep_id, _get_cell_processor(json_data, True, solver, use_cache=False))
+    return _worker_processor[1]
+
+
+def _solve_cells(json_data, capacities_list, reuse_model, solver=None, sweep_id=None):
+    """
+    Worker entry point: solves a batch of cells of the grid in a pool process.
+    With reuse_model and a sweep_id, the model instance is kept for the next task of the same sweep.
+    The solved results are returned too, so they can be cached by the parent process (workers
+    have no result cache of their own), and the spans and counters of the batch, so they can be
+    added to the trace of the sweep.
+    """
+    with tracing.Trace("sweep batch").activate() as trace:
+        if reuse_model and sweep_id is not None:
+            processor = _get_worker_processor(json_data, sweep_id, solver)
+            results = [(processor.fill_cell(capacities), processor.combined_json) for capacities in capacities_list]
+        else:
+            results = list(_iter_solve_cells(json_data, capacities_list, reuse_model, solver, use_cache=False))
+    return results, trace.spans, trace.counters
+
+
+class SweepEngine:
+    """
+    Solves all slider combinations of the two selected producers.
+
+    Attributes:
+    ----------
+    processor : OptimizerResultProcessor
+        The processor of the request, holds the json data and the selected sliders.
+    max_workers : int
+        Maximum number of cells solved at the same time. With 1, the cells are
+        solved one after another in the calling process.
+    cols : int
+        Number of slider positions of the column slider.
+    rows : int
+        Number of slider positions of the row slider.
+    adaptive : bool
+        Whether to refine a coarse subgrid instead of solving every cell of the grid.
+    cancel_event : threading.Event
+        If set, the remaining cells are not solved and SweepCancelled is raised.
+    progress : callable
+        Called with (done, total) after every solved cell.
+    mode : str
+        "cells" to build a model instance per cell, "persistent" to re-solve one instance per batch,
+        "warm" to re-solve one instance per batch in serpentine order with a warm-started solver.
+    solver : str
+        Solver backend of the cells solved by the engine, None uses the backend of the request.
+        In "warm" mode it is the backend of the request if it can warm-start, WARM_START_SOLVER otherwise.
+    prune : bool
+        Whether to skip the cells dominated by an infeasible cell. With a pool, every cell is a task
+        of its own, and at most max_workers cells are in flight so that lower cells can still be skipped.
+        In "persistent" and "warm" mode every worker re-solves the model instance of its previous task.
+    pruned : int
+        Number of cells returned as infeasible without solving them.
+    scheduled : int
+        Number of cells scheduled so far. It grows with every refinement of an adaptive sweep,
+        and is the total reported to progress.
+    """
+
+    def __init__(self, processor, max_workers=None, grid_size=GRID_SIZE, cancel_event=None, progress=None, mode=None,
+                 prune=False, adaptive=False):
+        self.processor = processor
+        self.max_workers = max_workers if max_workers is not None else get_max_workers()
+        self.mode = mode or get_setting("SWEEP_MODE", "cells")
+        if self.mode not in SWEEP_MODES:
+            raise ValueError(f"Invalid sweep mode: {self.mode}. Must be one of {SWEEP_MODES}.")
+        # grid_size is the number of positions of both axes, or (cols, rows)
+        self.cols, self.rows = (grid_size, grid_size) if isinstance(grid_size, int) else grid_size
+        if self.cols < 2 or self.rows < 2:
+            raise ValueError(f"Invalid grid size: {grid_size}. Both axes need at least 2 positions.")
+        self.adaptive = adaptive
+        self.cancel_event = cancel_event
+        self.progress = progress
+        self.prune = prune
+        self.pruned = 0
+        self.scheduled = 0
+
+        self.solver = None
+        if self.mode == "warm":
+            self.solver = processor.solver
+            if not solvers.supports_warm_start(self.solver):
+                self.solver = solvers.WARM_START_SOLVER
+        self._cached_cell_processor = None  # fills cached cells if the engine overrides the solver of the request
+
+    def _cache_key(self, capacities):
+        """Returns the result cache key of a cell solved by the backend of the engine."""
+        return result_cache.make_key(self.processor.json_data, capacities, self.solver or self.processor.solver)
+
+    def _fill_cached_cell(self, capacities):
+        """Fills a cell from the result cache of this process, with the results of the backend of the engine."""
+        if self.solver is None or self.solver == self.processor.solver:
+            return self.processor.fill_cell(capacities)
+        if self._cached_cell_processor is None:
+            self._cached_cell_processor = _get_cell_processor(self.processor.json_data, False, self.solver)
+        return self._cached_cell_processor.fill_cell(capacities)
+
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SweepCancelled("The sweep was cancelled")
+
+    def _get_slider_indices(self, prodCapacities):
+        """Returns the index of the column and row slider nodes in prodCapacities."""
+        sliderVals = self.processor.sliderVals
+        ids = [entry[0] for entry in prodCapacities]
+
+        indexCol = ids.index(sliderVals[0]["nodeID"]) if sliderVals[0]["nodeID"] in ids else -1
+        indexRow = ids.index(sliderVals[1]["nodeID"]) if sliderVals[1]["nodeID"] in ids else -1
+
+        if indexCol == -1 or indexRow == -1:
+            raise Exception("IDs of selectedNodes are not in prodCapacities")
+        return indexCol, indexRow
+
+    def cells(self, prodCapacities, positions=None):
+        """
+        Returns the list of (col, row, prodCapacities) of the cells at the given (col, row) positions
+        (default all cells of the grid), in the order the matrix is traversed (column by column,
+        in "warm" mode every other column bottom-up).
+        """
+        if positions is None:
+            positions = [(col, row) for col in range(self.cols) for row in range(self.rows)]
+        rowsByCol = {}
+        for col, row in sorted(positions):
+            rowsByCol.setdefault(col, []).append(row)
+
+        indexCol, indexRow = self._get_slider_indices(prodCapacities)
+        cells = []
+        for i, (col, rows) in enumerate(rowsByCol.items()):
+            if self.mode == "warm" and i % 2 == 1:
+                rows = reversed(rows)
+            for row in rows:
+                capacities = copy.deepcopy(prodCapacities)
+                capacities[indexCol][1] = slider_value(col, self.cols)
+                capacities[indexRow][1] = slider_value(row, self.rows)
+                cells.append((col, row, capacities))
+        return cells
+
+    def iter_results(self, prodCapacities, positions=None):
+        """
+        Solves the cells at the given (col, row) positions (default all cells of the grid) and
+        yields (col, row, prodCapacities, value) as soon as a cell is done.
+        The cells are yielded in completion order, not in matrix order.
+        """
+        cells = self.cells(prodCapacities, positions)
+        reuse_model = self.mode != "cells"
+
+        if self.prune:
+            yield from self._iter_pruned_results(cells, reuse_model)
+            return
+
+        if self.max_workers <= 1:
+            if reuse_model:
+                results = _iter_solve_cells(self.processor.json_data, [c[2] for c in cells], True, self.solver)
+            for col, row, capacities in cells:
+                self._check_cancelled()
+                value = next(results)[0] if reuse_model else self.processor.fill_cell(capacities)
+                yield col, row, capacities, value
+            return
+
+        # Cells solved before are filled from the cache in this process
+        cache = result_cache.get_result_cache()
+        uncached = []
+        for col, row, capacities in cells:
+            self._check_cancelled()
+            if cache is not None and self._cache_key(capacities) in cache:
+                yield col, row, capacities, self._fill_cached_cell(capacities)
+            else:
+                uncached.append((col, row, capacities))
+
+        pending = iter(self.batches(uncached))
+        yield from self._iter_pool_results(lambda: ([], next(pending, None)), reuse_model)
+
+    def _iter_pool_results(self, next_batch, reuse_model, sweep_id=None):
+        """
+        Solves batches of cells in the process pool, with at most max_workers batches in flight, and
+        yields (col, row, prodCapacities, value) of every cell as soon as its batch is done. The solved
+        results are stored in the result cache of this process.
+
+        next_batch is called whenever a worker is free. It returns the cells which are done without
+        solving them, which are yielded right away, and the next batch to solve, None if there is none.
+        It is only called after the results of the finished batches were yielded.
+        """
+        cache = result_cache.get_result_cache()
+        pool = get_process_pool()
+        futures = {}
+        try:
+            while True:
+                while len(futures) < self.max_workers:
+                    done_cells, batch = next_batch()
+                    yield from done_cells
+                    if batch is None:
+                        break
+                    future = pool.submit(
+                        _solve_cells, self.processor.json_data, [c[2] for c in batch], reuse_model, self.solver,
+                        sweep_id,
+                    )
+                    futures[future] = batch
+                if not futures:
+                    break
+
+                # Wake up regularly to react to a cancelled sweep
+                done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+                self._check_cancelled()
+                for future in done:
+                    batch = futures.pop(future)
+                    results, spans, counters = future.result()
+                    trace = tracing.get_current_trace()
+                    if trace is not None:
+                        trace.merge(spans, counters)
+                    for (col, row, capacities), (value, combined_json) in zip(batch, results):
+                        if cache is not None:
+                            cache.set(self._cache_key(capacities), combined_json)
+                        yield col, row, capacities, value
+        except BrokenProcessPool:
+            shutdown_process_pool()  # a worker died, start with a fresh pool next time
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _iter_pruned_results(self, cells, reuse_model):
+        """
+        Same as iter_results, but the cells are solved from the highest to the lowest slider sum
+        (descending anti-diagonals), and cells dominated by an infeasible cell are not solved.
+        """
+        # Cells on the same anti-diagonal stay in matrix order
+        pending = deque(sorted(cells, key=lambda cell: cell[0] + cell[1], reverse=True))
+        infeasible = set()  # (col, row) of the infeasible cells found so far
+
+        def take():
+            """Returns the next cell to solve, and the dominated cells skipped before it."""
+            skipped = []
+            while pending:
+                col, row, capacities = pending.popleft()
+                if any(col <= c and row <= r for c, r in infeasible):
+                    skipped.append((col, row, capacities))
+                else:
+                    return (col, row, capacities), skipped
+            return None, skipped
+
+        def solved(col, row, capacities, value):
+            if not is_feasible(value["matrixData"]):
+                infeasible.add((col, row))
+            return col, row, capacities, value
+
+        def skip(skipped):
+            for col, row, capacities in skipped:
+                self.pruned += 1
+                tracing.count("sweep.pruned")
+                yield col, row, capacities, pruned_cell()
+
+        if self.max_workers <= 1:
+            processor = self.processor
+            if reuse_model:
+                processor = _get_cell_processor(self.processor.json_data, True, self.solver)
+            while True:
+                self._check_cancelled()
+                cell, skipped = take()
+                yield from skip(skipped)
+                if cell is None:
+                    return
+                col, row, capacities = cell
+                yield solved(col, row, capacities, processor.fill_cell(capacities))
+
+        # Keep at most max_workers cells in flight, so their results can prune the next ones
+        cache = result_cache.get_result_cache()
+
+        def next_batch():
+            done_cells = []
+            while True:
+                cell, skipped = take()
+                done_cells.extend(skip(skipped))
+                if cell is None:
+                    return done_cells, None
+                col, row, capacities = cell
+                if cache is not None and self._cache_key(capacities) in cache:
+                    done_cells.append(solved(col, row, capacities, self._fill_cached_cell(capacities)))
+                    continue
+                return done_cells, [cell]
+
+        # Skipped and cached cells are recorded by next_batch already, recording them again is a no-op
+        results = self._iter_pool_results(next_batch, reuse_model, uuid.uuid4().hex)
+        for col, row, capacities, value in results:
+            yield solved(col, row, capacities, value)
+
+    def iter_adaptive_results(self, prodCapacities):
+        """
+        Same as iter_results, but solves a coarse subgrid (every stride-th position of both axes) first
+        and then halves the stride only inside the rectangles of solved cells which contain the boundary
+        between feasible and infeasible cells or the cheapest feasible cell found so far.
+        """
+        stride = self.coarse_stride()
+        values = {}  # (col, row) -> matrixData of the solved cells
+        positions = self.coarse_positions()
+        self.scheduled = 0
+        while True:
+            self.scheduled += len(positions)
+            for col, row, capacities, value in self.iter_results(prodCapacities, positions):
+                values[col, row] = value["matrixData"]
+                yield col, row, capacities, value
+            if stride == 1:
+                return
+
+            feasible = {position: value for position, value in values.items() if is_feasible(value)}
+            best = min(feasible, key=feasible.get) if feasible else None
+            cols, rows = axis_positions(self.cols, stride), axis_positions(self.rows, stride)
+            stride //= 2
+
+            refined = set()
+            for col0, col1 in zip(cols, cols[1:]):
+                for row0, row1 in zip(rows, rows[1:]):
+                    corners = [(col0, row0), (col0, row1), (col1, row0), (col1, row1)]
+                    if not all(corner in values for corner in corners):
+                        continue  # the rectangle was not refined at the previous stride
+                    boundary = len({corner in feasible for corner in corners}) > 1
+                    if boundary or best in corners:
+                        refined.update(
+                            (col, row)
+                            for col in axis_positions(self.cols, stride) if col0 <= col <= col1
+                            for row in axis_positions(self.rows, stride) if row0 <= row <= row1
+                        )
+            positions = sorted(refined - values.keys())
+
+    def coarse_stride(self):
+        """Returns the stride of the coarse subgrid an adaptive sweep starts with."""
+        stride = 1
+        while (max(self.cols, self.rows) - 1) / (stride * 2) >= ADAPTIVE_MIN_INTERVALS:
+            stride *= 2
+        return stride
+
+    def coarse_positions(self):
+        """Returns the (col, row) positions of the coarse subgrid an adaptive sweep starts with."""
+        stride = self.coarse_stride()
+        return [(col, row) for col in axis_positions(self.cols, stride) for row in axis_positions(self.rows, stride)]
+
+    def batches(self, cells):
+        """
+        Splits the cells into the tasks sent to the pool: one cell per task in "cells" mode,
+        one contiguous batch per worker in "persistent" and "warm" mode.
+        """
+        if self.mode == "cells" or not cells:
+            return [[cell] for cell in cells]
+        size = math.ceil(len(cells) / min(self.max_workers, len(cells)))
+        return [cells[i : i + size] for i in range(0, len(cells), size)]
+
+    def run(self, prodCapacities):
+        """
+        Fills the result matrix for all slider value combinations, or for the cells an adaptive sweep solves.
+
+        Returns:
+        -------
+        tuple
+            The result matrix indexed as [col][row] (cells not solved by an adaptive sweep are None)
+            and bestIdx, the prodCapacities of the cheapest feasible cell (all sliders 0 if no cell is feasible).
+        """
+        resultMatrix = self.empty_matrix()
+        capacitiesMatrix = self.empty_matrix()
+
+        # An adaptive sweep reports the cells scheduled so far as total, it grows with every refinement
+        self.scheduled = len(self.coarse_positions()) if self.adaptive else self.cols * self.rows
+        if self.progress is not None:
+            self.progress(0, self.scheduled)
+        # The spans of the sweep are aggregated on their own, and added to the trace of the request
+        with tracing.Trace(f"sweep of {self.cols * self.rows} cells", parent=tracing.get_current_trace()).activate() as trace:
+            for done, (col, row, capacities, value) in enumerate(self.iter_cell_results(prodCapacities), 1):
+                resultMatrix[col][row] = value
+                capacitiesMatrix[col][row] = capacities
+                if self.progress is not None:
+                    self.progress(done, self.scheduled)
+        trace.log(get_setting("TRACE_LOG_LEVEL", "DEBUG"))
+
+        return resultMatrix, self.select_best(resultMatrix, capacitiesMatrix, prodCapacities)
+
+    def iter_cell_results(self, prodCapacities):
+        """Yields the results of the sweep like iter_results, adaptive or of all cells."""
+        if self.adaptive:
+            return self.iter_adaptive_results(prodCapacities)
+        return self.iter_results(prodCapacities)
+
+    def empty_matrix(self):
+        """Returns a cols x rows matrix of None, indexed as [col][row]."""
+        return [[None for _ in range(self.rows)] for _ in range(self.cols)]
+
+    def select_best(self, resultMatrix, capacitiesMatrix, prodCapacities):
+        """
+        Returns bestIdx, the prodCapacities of the cheapest feasible cell (all sliders 0 if
+        no cell is feasible). Cells are compared in matrix order, so ties resolve like the serial sweep.
+        Cells which were not solved (None) are skipped.
+        """
+        bestMatrixVal = float("inf")
+        bestIdx = [[x[0], 0] for x in prodCapacities]
+        for col in range(self.cols):
+            for row in range(self.rows):
+                if resultMatrix[col][row] is None:
+                    continue
+                value = resultMatrix[col][row]["matrixData"]
+                if is_feasible(value) and bestMatrixVal > value:
+                    bestMatrixVal = value
+                    bestIdx = copy.deepcopy(capacitiesMatrix[col][row])
+
+        return bestIdx
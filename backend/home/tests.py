@@ -1,3 +1,31 @@
-from django.test import TestCase
+import copy
+from unittest import mock, skipUnless
+from django.test import SimpleTestCase
+from benchmarks.common import load_graph_data
+from graph_to_scenario import solvers
+from home import result_cache
+from home.response_processing_new import OptimizerResultProcessor
 
-# Create your tests here.
+AVAILABLE_SOLVER = next((name for name in solvers.list_solvers() if solvers.is_available(name)), None)
+
+
+@skipUnless(AVAILABLE_SOLVER, "no solver backend is available")
+class PruneInfeasibleTests(SimpleTestCase):
+    def sweep(self, prune):
+        """Returns the response of the auto-simulate sweep of scenario 1, solved in this process without cache."""
+        graph_data = load_graph_data("1", auto_simulate=True)
+        graph_data["sliderData"]["solver"] = AVAILABLE_SOLVER
+        graph_data["sliderData"]["pruneInfeasible"] = prune
+        with mock.patch.object(result_cache, "get_result_cache", return_value=None):
+            return OptimizerResultProcessor(copy.deepcopy(graph_data), max_workers=1).process_response()
+
+    def test_pruned_sweep_matches_unpruned_sweep(self):
+        unpruned = self.sweep(prune=False)
+        pruned = self.sweep(prune=True)
+
+        self.assertGreater(pruned["prunedCells"], 0)
+        self.assertEqual(
+            [[cell["matrixData"] for cell in column] for column in pruned["mainData"]],
+            [[cell["matrixData"] for cell in column] for column in unpruned["mainData"]],
+        )
+        self.assertEqual(pruned["bestIdx"], unpruned["bestIdx"])
@@ -1,12 +1,17 @@
 from django.urls import path
 from . import views
 from .views import process_scenario
-from .views import save_slider_data
+from .views import save_slider_data, stream_slider_data
+from .views import submit_solve_job, solve_job_status, cancel_solve_job
 #urls for home app
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/process-scenario/', process_scenario, name='process_scenario'), # url for default scenario loads
     path('api/save-slider-data/', save_slider_data, name='save_slider_data'), #url for slider input 
+    path('api/save-slider-data/stream/', stream_slider_data, name='stream_slider_data'), #url for slider input, streamed cell by cell
+    path('api/solve-jobs/', submit_solve_job, name='submit_solve_job'), #url for asynchronous slider input
+    path('api/solve-jobs/<str:job_id>/', solve_job_status, name='solve_job_status'), #url for job progress and result
+    path('api/solve-jobs/<str:job_id>/cancel/', cancel_solve_job, name='cancel_solve_job'), #url to cancel a job
     #path('api/upload_files/', upload_files, name='upload_files'), #url for Scenario Upload
     #path('api/save-scenario/', views.save_scenario, name='save_scenario'),
 ]
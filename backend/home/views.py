@@ -1,9 +1,41 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
-import json, os
+import json, logging, os
+from graph_to_scenario import tracing
+from home.conf import get_setting
 from home.response_processing_new import OptimizerResultProcessor
+from home.jobs import get_job_manager
+from home import result_serializer
+
+logger = logging.getLogger(__name__)
+
+# Requests with this header get the timings of their stages in the response ("timings" and Server-Timing)
+DEBUG_TIMING_HEADER = "X-Debug-Timing"
+
+
+def _debug_timing(request):
+    """Returns whether the request asks for the timings of its stages."""
+    return request.headers.get(DEBUG_TIMING_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def _result_response(data, status=200, format="records", trace=None):
+    """
+    Returns an optimizer result as JSON response, encoded once by the result serializer.
+    If a trace is given, its timings are attached to the result and as Server-Timing header.
+    """
+    if trace is not None:
+        data = {**data, "timings": trace.to_dict()}
+    with tracing.span("response.encode"):
+        response = HttpResponse(
+            result_serializer.dumps(data, format=format), status=status, content_type="application/json"
+        )
+    if trace is not None:
+        response["Server-Timing"] = trace.server_timing()
+    return response
 
 
 # Create your views here.
@@ -102,6 +134,11 @@ def save_slider_data(request):
     """
     Saves the slider data sent from the frontend.
 
+    The optional query parameter "format" selects the wire format of the chart data:
+    "records" (default), "columnar" or "columnar-base64", see result_serializer.dumps.
+    The optional sliderData field "maxPoints" downsamples every chart series to about that
+    many points, without it every timestep is sent.
+
     Parameters:
     ----------
     request : HttpRequest
@@ -109,20 +146,182 @@ def save_slider_data(request):
 
     Returns:
     -------
-    JsonResponse
-        The result of processing the slider data, or an error message.
+    HttpResponse or JsonResponse
+        The JSON result of processing the slider data, or an error message.
     """
     if request.method == "POST":
-        print("Request received:", request.body)
+        logger.debug("Request received: %s", request.body)
+        format = request.GET.get("format", "records")
+        if format not in result_serializer.FORMATS:
+            return JsonResponse(
+                {"error": f"Invalid 'format' parameter. Use one of {', '.join(result_serializer.FORMATS)}."},
+                status=400,
+            )
         try:
             # Parse the incoming JSON data
             data = json.loads(request.body)
             # Directly pass the data to process_response() instead of saving and then retrieving
             #result = process_response(data) #old implementation
-            result = OptimizerResultProcessor(data).process_response()
+            with tracing.Trace("save_slider_data").activate() as trace:
+                result = OptimizerResultProcessor(data).process_response()
+                response = _result_response(
+                    result, status=200, format=format, trace=trace if _debug_timing(request) else None
+                )
+            trace.log(get_setting("TRACE_LOG_LEVEL", "DEBUG"))
+            return response
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data."}, status=400)
+        except ValueError as e:  # invalid slider data, e.g. maxPoints
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Invalid HTTP method."}, status=405)
+
+
+def _server_sent_events(processor, debug_timing=False):
+    """
+    Yields the events of processor.stream_response() in the Server-Sent Events format.
+    An error while solving is sent as "error" event, as the response status is already sent.
+    With debug_timing, the timings of the request are added to the "done" event.
+    """
+    trace = tracing.Trace("stream_slider_data")
+    events = processor.stream_response()
+    try:
+        while True:
+            # The trace is activated for every step, as the steps may run in different threads
+            with trace.activate():
+                item = next(events, None)
+                if item is None:
+                    break
+                event, data = item
+                if event == "done" and debug_timing:
+                    data = {**data, "timings": trace.to_dict()}
+                with tracing.span("response.encode"):
+                    encoded = result_serializer.dumps(data).decode()
+            yield f"event: {event}\ndata: {encoded}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    trace.log(get_setting("TRACE_LOG_LEVEL", "DEBUG"))
+
+
+async def _async_server_sent_events(processor, debug_timing=False):
+    """Async version of _server_sent_events, so the events are streamed and not buffered under ASGI."""
+    events = _server_sent_events(processor, debug_timing)
+    next_event = sync_to_async(next, thread_sensitive=False)
+    while True:
+        event = await next_event(events, None)
+        if event is None:
+            return
+        yield event
 
-            return JsonResponse(result, status=200)
 
+@csrf_exempt
+def stream_slider_data(request):
+    """
+    Same as save_slider_data, but streams every cell to the frontend as soon as it is solved,
+    using Server-Sent Events ("cell" events, then a final "done" event with bestIdx).
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The request object containing the slider data.
+
+    Returns:
+    -------
+    StreamingHttpResponse or JsonResponse
+        The event stream, or an error message.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data."}, status=400)
+
+        processor = OptimizerResultProcessor(data)
+        if isinstance(request, ASGIRequest):
+            events = _async_server_sent_events(processor, _debug_timing(request))
+        else:
+            events = _server_sent_events(processor, _debug_timing(request))
+
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # disable response buffering of nginx
+        return response
+    return JsonResponse({"error": "Invalid HTTP method."}, status=405)
+
+
+@csrf_exempt
+def submit_solve_job(request):
+    """
+    Queues the optimization for the slider data sent from the frontend and returns right away.
+
+    The body is the same as for save_slider_data. An optional top-level "clientId" identifies
+    the client: a new job of the same client cancels its previous, still running job.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The request object containing the slider data.
+
+    Returns:
+    -------
+    JsonResponse
+        The id and status of the queued job, or an error message.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data."}, status=400)
+
+        job = get_job_manager().submit(data, client_id=data.get("clientId"))
+        return JsonResponse(job.to_dict(include_result=False), status=202)
+    return JsonResponse({"error": "Invalid HTTP method."}, status=405)
+
+
+def solve_job_status(request, job_id):
+    """
+    Returns the progress of a solve job, and its result once it is done.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The request object.
+    job_id : str
+        The id returned by submit_solve_job.
+
+    Returns:
+    -------
+    HttpResponse or JsonResponse
+        The JSON status, e.g. {"status": "running", "progress": "17/36 cells done", ...}, or an error message.
+    """
+    if request.method == "GET":
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return JsonResponse({"error": "Job not found."}, status=404)
+        return _result_response(job.to_dict(include_timings=_debug_timing(request)), status=200)
+    return JsonResponse({"error": "Invalid HTTP method."}, status=405)
+
+
+@csrf_exempt
+def cancel_solve_job(request, job_id):
+    """
+    Cancels the remaining cells of a solve job.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The request object.
+    job_id : str
+        The id returned by submit_solve_job.
+
+    Returns:
+    -------
+    JsonResponse
+        The status of the job, or an error message.
+    """
+    if request.method == "POST":
+        job = get_job_manager().cancel(job_id)
+        if job is None:
+            return JsonResponse({"error": "Job not found."}, status=404)
+        return JsonResponse(job.to_dict(include_result=False), status=200)
     return JsonResponse({"error": "Invalid HTTP method."}, status=405)